@@ -0,0 +1,184 @@
+'''
+This module is a reproducible benchmark suite for `PDEsolver`, so a change to `derivative`, `create_grid` or the RHS functions
+can be checked for speed regressions. Every benchmark is timed as the best of several repeats (as in timeit), and the results
+are written to a JSON file, which can be compared with the results of an earlier run. Functions in this module include:
+
+bench_derivative(sizes)
+bench_rhs(sizes)
+bench_solve(sizes,methods)
+bench_accuracy(targets,sizes,rtols)
+run(filename,quick)
+compare(old,new,threshold)
+
+It can also be used from the terminal:
+python PDEbenchmark.py run results.json [--quick]
+python PDEbenchmark.py compare old.json new.json [--threshold 1.1]
+'''
+
+import sys
+import json
+import timeit
+import platform
+import argparse
+import numpy as np
+import scipy
+import PDEsolver as pde
+from PDEsweep import initial_conditions
+
+# The benchmark problem: a Gaussian on the domain used in Project_error_evaluation.ipynb
+length = 10*np.pi
+D = 0.5
+v = 0.5
+gaussian = initial_conditions['gaussian']
+
+def _best_time(fun, repeat=5, min_time=0.2):
+    '''
+    This function returns the best time of one call of fun, out of `repeat` runs of a loop that takes at least min_time seconds.
+    '''
+    timer = timeit.Timer(fun)
+    number, _ = timer.autorange()
+    number = max(1, int(np.ceil(number*min_time/0.2)))
+    return min(timer.repeat(repeat=repeat, number=number))/number
+
+def bench_derivative(sizes=(64,256,1024,4096,16384)):
+    '''
+    This function times the first derivative of a real function with derivative(), for each number of grid points.
+    The throughput is the number of grid points differentiated per second.
+    '''
+    results = {}
+    for N in sizes:
+        grid = pde.create_grid(length, N)
+        f = gaussian(grid.x)
+        out = np.empty(N)
+        seconds = _best_time(lambda: pde.derivative(grid, f, 1, out=out))
+        results['N={}'.format(N)] = dict(seconds=seconds, points_per_second=N/seconds)
+    return results
+
+def bench_rhs(sizes=(64,256,1024,4096)):
+    '''
+    This function times one evaluation of adv_diff_eq and burger_eq, for each number of grid points.
+    '''
+    results = {}
+    for N in sizes:
+        grid = pde.create_grid(length, N)
+        u = gaussian(grid.x)
+        out = np.empty(N)
+        for name, fun, args in (('adv_diff_eq', pde.adv_diff_eq, (D, v)), ('burger_eq', pde.burger_eq, (D,))):
+            seconds = _best_time(lambda: fun(0, u, grid, *args, out=out))
+            results['{} N={}'.format(name, N)] = dict(seconds=seconds, evaluations_per_second=1/seconds)
+    return results
+
+def _solve(equation, method, grid, u0, t, **options):
+    '''
+    This function solves the benchmark problem with a solve_ivp method, 'ETDRK4' or 'IMEX'.
+    '''
+    fun, args = (pde.adv_diff_eq, (grid, D, v)) if equation == 'adv_diff' else (pde.burger_eq, (grid, D))
+    return pde.solve(fun, t, u0, args, method, **options)
+
+def bench_solve(sizes=(64,256,1024), methods=('DOP853','ETDRK4')):
+    '''
+    This function times the whole solution of the advection diffusion and burger's equations from t = 0 to 10, for each number of grid points and method.
+    '''
+    t = pde.time_domain(10, 0.1)
+    results = {}
+    for N in sizes:
+        grid = pde.create_grid(length, N)
+        u0 = gaussian(grid.x)
+        for equation in ('adv_diff', 'burger'):
+            for method in methods:
+                u = _solve(equation, method, grid, u0, t)
+                seconds = _best_time(lambda: _solve(equation, method, grid, u0, t), repeat=3, min_time=0.05)
+                results['{} {} N={}'.format(equation, method, N)] = dict(seconds=seconds, nfev=int(u.nfev))
+    return results
+
+def bench_accuracy(targets=(1e-3,1e-6,1e-9), sizes=(32,64,128,256), rtols=(1e-3,1e-5,1e-7,1e-9,1e-11)):
+    '''
+    This function measures the time to accuracy of solve_ivp (DOP853) for the advection diffusion equation.
+    Every combination of the number of grid points and the tolerance rtol is timed, and its error is the absolute mean error
+    against the exact solution adv_diff_exact() on a fine grid. For each target error, the result is the fastest combination that reaches it.
+    '''
+    t = pde.time_domain(10, 0.1)
+    fine = pde.create_grid(length, 1024)
+    exact = pde.adv_diff_exact(t, fine, gaussian(fine.x), D, v).y
+    runs = []
+    for N in sizes:
+        grid = pde.create_grid(length, N)
+        u0 = gaussian(grid.x)
+        for rtol in rtols:
+            u = _solve('adv_diff', 'DOP853', grid, u0, t, rtol=rtol, atol=rtol*1e-2)
+            error = np.mean(np.abs(u.y - exact[::1024//N]))
+            seconds = _best_time(lambda: _solve('adv_diff', 'DOP853', grid, u0, t, rtol=rtol, atol=rtol*1e-2), repeat=3, min_time=0.05)
+            runs.append(dict(N=N, rtol=rtol, error=float(error), seconds=seconds))
+    results = {}
+    for target in targets:
+        reached = [r for r in runs if r['error'] <= target]
+        if reached:
+            results['error<={:g}'.format(target)] = dict(min(reached, key=lambda r: r['seconds']))
+    return results
+
+def run(filename=None, quick=False):
+    '''
+    This function runs every benchmark, and writes the results to the JSON file `filename` (if it is given).
+    quick runs the smaller sizes only, e.g. for a quick check during development.
+
+    Returns:
+    results: a dictionary with the versions of Python and the packages, and the results of every benchmark.
+    '''
+    if quick:
+        benchmarks = dict(derivative=bench_derivative((64,1024)), rhs=bench_rhs((64,1024)),
+                          solve=bench_solve((64,256)), accuracy=bench_accuracy((1e-3,1e-6), (32,64), (1e-3,1e-6,1e-9)))
+    else:
+        benchmarks = dict(derivative=bench_derivative(), rhs=bench_rhs(), solve=bench_solve(), accuracy=bench_accuracy())
+    results = dict(machine=dict(python=platform.python_version(), numpy=np.__version__, scipy=scipy.__version__,
+                                platform=platform.platform(), processor=platform.processor()),
+                   quick=quick, benchmarks=benchmarks)
+    if filename is not None:
+        with open(filename, 'w') as f:
+            json.dump(results, f, indent=1)
+    return results
+
+def compare(old, new, threshold=1.1):
+    '''
+    This function compares two benchmark results (dictionaries from run(), or the names of their JSON files).
+    Every benchmark in both results is listed with the ratio of the new time to the old time, and the benchmarks that
+    became slower by more than `threshold` are marked as regressions.
+
+    Returns:
+    regressions: a list of the names of the slower benchmarks.
+    '''
+    if isinstance(old, str):
+        with open(old) as f:
+            old = json.load(f)
+    if isinstance(new, str):
+        with open(new) as f:
+            new = json.load(f)
+    regressions = []
+    print('{:<40}{:>14}{:>14}{:>10}'.format('benchmark', 'old [s]', 'new [s]', 'ratio'))
+    for group, results in new['benchmarks'].items():
+        for name, result in results.items():
+            if name not in old['benchmarks'].get(group, {}):
+                continue
+            ratio = result['seconds']/old['benchmarks'][group][name]['seconds']
+            label = '{}: {}'.format(group, name)
+            if ratio > threshold:
+                regressions.append(label)
+            print('{:<40}{:>14.3e}{:>14.3e}{:>10.2f}{}'.format(label, old['benchmarks'][group][name]['seconds'], result['seconds'],
+                                                            ratio, '  slower' if ratio > threshold else ''))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of PDEsolver.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmarks and write the results to a JSON file')
+    run_parser.add_argument('filename')
+    run_parser.add_argument('--quick', action='store_true', help='run the smaller sizes only')
+    compare_parser = commands.add_parser('compare', help='compare two JSON files of results')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=1.1, help='ratio of the times above which a benchmark is a regression')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'run':
+        run(arguments.filename, arguments.quick)
+    else:
+        sys.exit(1 if compare(arguments.old, arguments.new, arguments.threshold) else 0)
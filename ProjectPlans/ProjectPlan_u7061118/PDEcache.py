@@ -0,0 +1,209 @@
+'''
+This module is an on-disk cache of the solutions of `PDEsolver`, so that a configuration that was already solved (e.g. the same burger's equation
+in several notebooks) is loaded from the disk instead of being solved again. Every solution is stored under a content-addressed key:
+a hash of the grid parameters, the equation, its coefficients, the initial condition array, the time grid and the integrator settings,
+together with a hash of the source code of `PDEsolver` (and the versions of numpy and scipy), so a change of the solver code never returns an old solution.
+The size of the cache is bounded: when it is full, the least recently used solutions are removed. Functions and classes in this module include:
+
+solution_cache(path,max_size)
+solution_cache.solve(fun,t,u0,args,method)
+solution_cache.key(fun,t,u0,args,method)
+solution_cache.entries()
+solution_cache.prune()
+solution_cache.clear()
+source_version()
+'''
+
+import os
+import json
+import hashlib
+import numpy as np
+import scipy
+from scipy.optimize import OptimizeResult
+import PDEsolver as pde
+
+def source_version():
+    '''
+    This function returns the version of the solver that is part of every key: a hash of the source code of PDEsolver.py
+    and the versions of numpy and scipy. Any change of the solver code changes the version, so the solutions of the old code are not used again.
+    '''
+    with open(pde.__file__, 'rb') as f:
+        source = f.read()
+    return hashlib.sha1(source + np.__version__.encode() + scipy.__version__.encode()).hexdigest()[:16]
+
+def _array_hash(a):
+    '''
+    The hash of the content, shape and dtype of an array.
+    '''
+    a = np.ascontiguousarray(a)
+    return hashlib.sha1(a.tobytes() + str(a.shape).encode() + a.dtype.str.encode()).hexdigest()
+
+def _describe(value):
+    '''
+    This function returns a description of a value that can be written to JSON: numbers and strings are kept, arrays are replaced by their hash,
+    and functions by their module and name. A function without a unique name (e.g. a lambda) cannot be part of a key.
+    '''
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return dict(array=_array_hash(value))
+    if isinstance(value, (tuple, list)):
+        return [_describe(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _describe(v) for k, v in value.items()}
+    if callable(value):
+        name = getattr(value, '__qualname__', getattr(value, '__name__', ''))
+        if not name or '<lambda>' in name or '<locals>' in name:
+            raise ValueError("The function {!r} cannot be part of a cache key, use a function defined at the top level of a module.".format(value))
+        return dict(function='{}.{}'.format(getattr(value, '__module__', ''), name))
+    raise ValueError("The value {!r} cannot be part of a cache key.".format(value))
+
+class solution_cache:
+    '''
+    This is a class of the on-disk cache of PDE solutions in the directory `path`, which can be shared by several notebooks and processes.
+    Each solution is one file `<key>.npz`, written under a temporary name first, so a file in the cache is always complete.
+    The last use of a solution is the modification time of its file, which is updated on every load, so no index file is needed.
+    max_size is the largest total size of the files in bytes (the default is 1 GB). When a new solution makes the cache larger,
+    the least recently used solutions are removed first.
+    '''
+    def __init__(self, path, max_size=2**30):
+        self.path = path
+        self.max_size = max_size
+        self.version = source_version()
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, fun, t, u0, args, method='DOP853', **options):
+        '''
+        This is the function to find the key of a solution, and the description it is the hash of.
+        The description contains the version of the solver, the grid settings, the equation (and the terms of an equation from compose_eq),
+        the coefficients, the hash of the initial condition, the times t, the method and the other options.
+        The key starts with the version, so the solutions of other versions of the solver are found without reading them.
+        '''
+        grid = args[0]
+        description = dict(version=self.version, grid=_describe(grid.settings), equation=fun.__name__,
+                           terms=_describe(getattr(fun, 'terms', None)), coefficients=_describe(list(args[1:])),
+                           u0=_array_hash(np.asarray(u0)), t=_array_hash(np.asarray(t, dtype=float)),
+                           method=method, options=_describe(options))
+        key = '{}_{}'.format(self.version, hashlib.sha1(json.dumps(description, sort_keys=True).encode()).hexdigest()[:20])
+        return key, description
+
+    def _file(self, key):
+        '''
+        The file of the solution with the given key.
+        '''
+        return os.path.join(self.path, key + '.npz')
+
+    def solve(self, fun, t, u0, args, method='DOP853', **options):
+        '''
+        This is the function to solve the PDE, or to load the solution from the cache if the same problem was solved before.
+        fun is the RHS function, e.g. burger_eq, adv_diff_eq or an equation from compose_eq.
+        t is the temporal domain, which should take the form t = time_domain(tmax,dt).
+        u0 is the initial condition (or a 2D array of initial conditions for an ensemble).
+        args is the tuple of the other inputs of fun, e.g. (grid,D) for burger_eq.
+        method is a solve_ivp method, 'ETDRK4', 'IMEX' or 'exact' (advection diffusion only), and the other options are passed to the solver.
+        Functions in args or options (e.g. a boundary value g(t) of a Chebyshev grid) must be defined at the top level of a module.
+        A solution that failed (success is False) is returned, but not stored.
+
+        Returns:
+        u: the solution with the attributes `t`, `y`, `nfev`, `success` and `message` (as in the output of solve_ivp), `key`,
+        and `cached`, which is True if the solution was loaded from the cache.
+        '''
+        try:
+            if 'store' in options or 'checkpoint' in options:
+                raise ValueError("A cached solution is kept in the cache, so `store` and `checkpoint` cannot be used.")
+            if method not in pde.methods:
+                raise ValueError("`method` must be one of {}.".format(list(pde.methods)))
+            if method == 'exact' and fun is not pde.adv_diff_eq:
+                raise ValueError("The 'exact' method is only available for the advection diffusion equation.")
+            key, description = self.key(fun, t, u0, args, method, **options)
+        except ValueError as e:
+            print("Value Error:", str(e))
+            return None
+
+        path = self._file(key)
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    u = OptimizeResult(t=data['t'], y=data['y'], nfev=int(data['nfev']), status=0, message=str(data['message']),
+                                       success=True, key=key, cached=True)
+                os.utime(path)                                 # the last use, for the LRU eviction
+                return u
+            except (OSError, ValueError, KeyError):
+                pass                                           # a damaged or removed file is solved again
+
+        u = pde.solve(fun, np.asarray(t, dtype=float), u0, args, method, **options)
+        if u is None:
+            return None
+        u.key, u.cached = key, False
+        if u.success:
+            tmp_path = path + '.tmp.npz'
+            np.savez(tmp_path, t=u.t, y=np.asarray(u.y), nfev=u.nfev, message=u.message, description=json.dumps(description))
+            os.replace(tmp_path, path)
+            self._evict(keep=path)
+        return u
+
+    def entries(self):
+        '''
+        This is the function to list the solutions in the cache, from the least to the most recently used.
+
+        Returns:
+        entries: a list with one dictionary per solution (key, size in bytes, last_used as a time stamp, and current,
+        which is False if the solution is from another version of the solver).
+        '''
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith('.npz') or name.endswith('.tmp.npz'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue                                       # removed by another process
+            entries.append(dict(key=name[:-4], size=stat.st_size, last_used=stat.st_mtime,
+                                current=name.startswith(self.version + '_')))
+        entries.sort(key=lambda entry: entry['last_used'])
+        return entries
+
+    def _evict(self, keep=None):
+        '''
+        This function removes the least recently used solutions (but not the file `keep`) until the cache is not larger than max_size.
+        '''
+        entries = [entry for entry in self.entries() if self._file(entry['key']) != keep]
+        size = sum(entry['size'] for entry in entries)
+        if keep is not None and os.path.exists(keep):
+            size += os.path.getsize(keep)
+        for entry in entries:
+            if size <= self.max_size:
+                break
+            self._remove(entry['key'])
+            size -= entry['size']
+
+    def _remove(self, key):
+        '''
+        This function removes one solution, if it was not already removed by another process.
+        '''
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def prune(self):
+        '''
+        This is the function to remove the solutions of other versions of the solver, which can never be loaded again.
+        Returns the number of removed solutions.
+        '''
+        old = [entry['key'] for entry in self.entries() if not entry['current']]
+        for key in old:
+            self._remove(key)
+        return len(old)
+
+    def clear(self):
+        '''
+        This is the function to remove every solution in the cache.
+        '''
+        for entry in self.entries():
+            self._remove(entry['key'])
+
+    def __len__(self):
+        return len(self.entries())
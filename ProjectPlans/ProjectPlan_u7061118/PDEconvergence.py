@@ -0,0 +1,159 @@
+'''
+This module runs convergence-versus-cost studies of `PDEsolver`. It sweeps the number of grid points and the time step,
+and for each setting it records the L2 and L∞ errors against a reference solution, the wall time and the peak memory of the solution.
+The reference is the exact propagator adv_diff_exact() for the advection diffusion equation, or a high-resolution ETDRK4 solution
+for the burger's equation, both on a fine grid. The settings are solved in parallel, and every result is cached in an on-disk store,
+so a repeated or extended study only solves the new settings. Functions in this module include:
+
+study(num_of_points,dt,t,store,equation,method,D,v,length,ic,reference_points,reference_dt,processes)
+pareto(results,error,cost)
+'''
+
+import os
+import json
+import time
+import hashlib
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import PDEsolver as pde
+from PDEsweep import initial_conditions
+
+def _key(description):
+    '''
+    The cache key of a setting or a reference: a hash of its JSON description.
+    '''
+    return hashlib.sha1(json.dumps(description, sort_keys=True).encode()).hexdigest()[:16]
+
+def _interpolate(y, num_of_points):
+    '''
+    This function interpolates the solution y (grid points x time) to a finer grid with num_of_points points, by padding its spectrum with zeros.
+    For an even number of points, the Nyquist coefficient stands for both wavenumbers +N/2 and -N/2, so it is split between them (halved).
+    '''
+    yhat = np.fft.rfft(y, axis=0)
+    if len(y) % 2 == 0:
+        yhat[len(y)//2] *= 0.5
+    return np.fft.irfft(yhat, n=num_of_points, axis=0)*num_of_points/len(y)
+
+def _reference(problem, t, store, reference_points, reference_dt):
+    '''
+    This function returns the file of the reference solution of the problem on the fine grid, and calculates it if it is not in the store.
+    '''
+    description = dict(problem, t=list(t), reference_points=reference_points)
+    if problem['equation'] != 'adv_diff':
+        description['reference_dt'] = reference_dt             # the exact propagator does not use a time step
+    path = os.path.join(store, 'reference_{}.npy'.format(_key(description)))
+    if not os.path.exists(path):
+        grid = pde.create_grid(problem['length'], reference_points)
+        u0 = initial_conditions[problem['ic']](grid.x)
+        if problem['equation'] == 'adv_diff':
+            u = pde.adv_diff_exact(t, grid, u0, problem['D'], problem['v'])
+        else:
+            u = pde.solve_etdrk4(pde.burger_eq, t, u0, (grid, problem['D']), dt=reference_dt)
+        np.save(path + '.tmp.npy', u.y)
+        os.replace(path + '.tmp.npy', path)
+    return path
+
+def _run_setting(setting, problem, t, reference, path):
+    '''
+    This function solves one setting in a worker process, and writes its errors, wall time and peak memory to the store.
+    The file is written under a temporary name first, so a finished file in the store is always complete.
+    '''
+    grid = pde.create_grid(problem['length'], setting['num_of_points'])
+    u0 = initial_conditions[problem['ic']](grid.x)
+    if problem['equation'] == 'adv_diff':
+        fun, args = pde.adv_diff_eq, (grid, problem['D'], problem['v'])
+    else:
+        fun, args = pde.burger_eq, (grid, problem['D'])
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    step = 'dt' if setting['method'] in ('ETDRK4', 'IMEX') else 'max_step'
+    u = pde.solve(fun, t, u0, args, setting['method'], **{step: setting['dt']})
+    seconds = time.perf_counter() - start
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    y_ref = np.load(reference)
+    error = _interpolate(u.y, len(y_ref)) - y_ref
+    dx = problem['length']/len(y_ref)
+    result = dict(setting, L2=float(np.max(np.sqrt(dx*np.sum(error**2, axis=0)))), Linf=float(np.max(np.abs(error))),
+                  seconds=seconds, peak_memory=int(peak_memory), nfev=int(u.nfev), success=bool(u.success))
+    with open(path + '.tmp', 'w') as f:
+        json.dump(result, f)
+    os.replace(path + '.tmp', path)
+    return result
+
+def study(num_of_points, dt, t, store, equation='adv_diff', method='ETDRK4', D=0.5, v=0.5, length=10*np.pi, ic='gaussian',
+          reference_points=2048, reference_dt=1e-3, processes=None, verbose=True):
+    '''
+    This function solves the PDE for every combination of the numbers of grid points `num_of_points` and the time steps `dt`,
+    and returns the error and cost of each solution. The settings are solved by a pool of `processes` worker processes (the default is the number of CPUs),
+    and each result is written to the directory `store`. A setting that is already in the store is not solved again.
+    t is the temporal domain, which should take the form t = time_domain(tmax,dt).
+    equation is 'adv_diff' (with D and v) or 'burger' (with D), and method is 'ETDRK4', 'IMEX' or a solve_ivp method (with dt as the largest step).
+    ic is the name of one of the initial conditions of PDEsweep, and length is the length of the domain.
+    The reference solution is calculated on a grid of reference_points points: the exact propagator for the advection diffusion equation,
+    or an ETDRK4 solution with the fixed time step reference_dt for the burger's equation. reference_dt should be smaller than every dt;
+    it does not depend on dt, so the reference (and every cached setting) is reused when a study is extended with smaller time steps.
+    Each solution is interpolated to the reference grid, and its errors are the largest L2 norm and the largest absolute error over all times t.
+    The wall time is measured in the worker, so it includes the competition with the other workers for the CPU and memory.
+    The peak memory is the largest memory allocated during the solution, measured by tracemalloc (which also makes the solution slower).
+
+    Returns:
+    results: a list with one dictionary per setting (num_of_points, dt, method, L2, Linf, seconds, peak_memory, nfev and success).
+    '''
+    try:
+        if equation not in ('adv_diff', 'burger'):
+            raise ValueError("`equation` must be 'adv_diff' or 'burger'.")
+        if ic not in initial_conditions:
+            raise ValueError("`ic` must be one of {}.".format(list(initial_conditions)))
+        if max(num_of_points) > reference_points:
+            raise ValueError("`reference_points` must be larger than every value of `num_of_points`.")
+        if not(isinstance(reference_dt, (float, int))) or reference_dt <= 0:
+            raise ValueError("`reference_dt` must be a numeric value greater than 0.")
+    except ValueError as e:
+        print("Value Error:", str(e))
+        return None
+
+    os.makedirs(store, exist_ok=True)
+    t = np.asarray(t, dtype=float)
+    problem = dict(equation=equation, D=D, v=v if equation == 'adv_diff' else None, length=length, ic=ic)
+    reference = _reference(problem, t, store, reference_points, reference_dt)
+
+    settings = [dict(num_of_points=int(N), dt=float(dt_i), method=method) for N in num_of_points for dt_i in dt]
+    paths = [os.path.join(store, '{}.json'.format(_key(dict(problem, **setting, t=list(t), reference=os.path.basename(reference)))))
+             for setting in settings]
+    results = [None]*len(settings)
+    for i, path in enumerate(paths):
+        if os.path.exists(path):
+            with open(path) as f:
+                results[i] = json.load(f)
+    todo = [i for i in range(len(settings)) if results[i] is None]
+    if verbose:
+        print('{} settings: {} cached, {} to solve'.format(len(settings), len(settings) - len(todo), len(todo)))
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(_run_setting, settings[i], problem, t, reference, paths[i]) for i in todo]
+            # Collect in submission order, so the progress report is deterministic
+            for i, future in zip(todo, futures):
+                results[i] = future.result()
+                if verbose:
+                    print('num_of_points = {}, dt = {}: L2 = {:.3e}, Linf = {:.3e}, {:.3f} s'.format(
+                        results[i]['num_of_points'], results[i]['dt'], results[i]['L2'], results[i]['Linf'], results[i]['seconds']))
+    return results
+
+def pareto(results, error='L2', cost='seconds'):
+    '''
+    This function finds the Pareto frontier of cost versus accuracy: the settings for which no other setting is both cheaper and more accurate.
+    error is 'L2' or 'Linf', and cost is 'seconds', 'peak_memory' or 'nfev'.
+
+    Returns:
+    frontier: the results on the frontier, from the cheapest (and least accurate) to the most accurate.
+    '''
+    frontier = []
+    for result in sorted(results, key=lambda r: (r[cost], r[error])):
+        if not frontier or result[error] < frontier[-1][error]:
+            frontier.append(result)
+    return frontier
@@ -1,19 +1,68 @@
 '''
-This module is designed to solve one-dimensional first-order Partial Differential Equations (PDEs). It uses the pseudo-spectral method to solve PDEs, based on the Fourier basis. Functions in this module include:
+This module is designed to solve first-order Partial Differential Equations (PDEs) on one-dimensional, and also 2D and 3D, periodic domains. It uses the pseudo-spectral method to solve PDEs, based on the Fourier basis. Functions in this module include:
 
 time_domain(tmax,dt)
-create_grid(length,num_of_points)
-derivative(grid,f,order)
+profiling(report,memory)
+create_grid(length,num_of_points,backend,workers,dealias,jit,dtype)
+chebyshev_grid(length,num_of_points,bc,bc_method,workers)
+derivative(grid,f,order,axis)
+derivatives(grid,f,orders,axis)
+laplacian(grid,f)
+gradient(grid,f)
 adv_diff_eq(u,t,grid,D,v)
 burger_eq(u,t,grid,D,v)
-plot_anim(t,grid,u0,u)
+adv_diff_exact(t,grid,u0,D,v,store)
+compose_eq(terms,name)
+solve_etdrk4(fun,t,u0,args,dt,store,checkpoint)
+solve_imex(fun,t,u0,args,dt,store,checkpoint)
+solve_ensemble(fun,t,u0,args,method)
+solve(fun,t,u0,args,method)
+to_spectral(grid,u)
+from_spectral(grid,y,shape)
+spectral_rhs(fun,args)
+solve_spectral(fun,t,u0,args,method)
+jacobian(fun,args,spectral,form)
+snapshot_store(path)
+solve_stream(fun,t,u0,args,store,method)
+checkpoint_file(path,steps,seconds)
+resume(path,steps,seconds)
+plot_anim(t,grid,u0,u,every)
+save_anim(filename,t,grid,u,every,fps,processes)
 '''
 
+import os
+import re
+import json
+import hashlib
+import time
+import shutil
+import subprocess
+import tracemalloc
+from itertools import repeat
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import scipy.fft
+import scipy.integrate
+import scipy.sparse
+from scipy.sparse.linalg import LinearOperator
+from scipy.optimize import OptimizeResult
+from scipy.integrate import solve_ivp
 import matplotlib.pyplot as plt
 from matplotlib import animation
 from IPython.display import HTML
 from matplotlib import cm
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image, GifImagePlugin
+try:
+    import pyfftw                  # optional FFT backend
+except ImportError:
+    pyfftw = None
+try:
+    import numba                   # optional JIT-compiled kernels
+except ImportError:
+    numba = None
 
 # Temporal Domain
 def time_domain(tmax,dt):
@@ -38,23 +87,297 @@ def time_domain(tmax,dt):
         print("Value Error:", str(e))
         return None
 
+# Opt-in profiling of the hot path
+_profile = None                    # the active profiling context, None when profiling is off
+
+class profiling:
+    '''
+    This is a class that profiles the solvers of this module. Inside `with profiling():`, the calls of the RHS functions, the derivative functions
+    and the Fourier transforms of the grids are counted and timed, and the time of each term of the equations (the spectral derivatives,
+    D*u_xx, -v*u_x and -u*u_x) is added up. When the block ends, a summary table is printed (if report is True), e.g.
+
+        with PDEsolver.profiling() as prof:
+            u = solve_ivp(PDEsolver.burger_eq, [t[0],t[-1]], u0, t_eval=t, args=(grid,D))
+
+    The time that is not spent in the RHS functions (the integrator, e.g. solve_ivp, and Python overhead) is shown as 'other'.
+    If memory is True, the peak memory allocated in the block is also measured with tracemalloc, which slows down the solve.
+    When profiling is off, every profiled function only checks that the global `_profile` is None, so the overhead is negligible.
+    The counts and times are stored in `calls` and `times`, with (kind, name) keys.
+    '''
+    def __init__(self, report=True, memory=False):
+        self.report = report
+        self.memory = memory
+        self.calls = {}
+        self.times = {}
+        self.wall = 0.0
+        self.peak = None
+
+    def __enter__(self):
+        global _profile
+        self.previous = _profile
+        _profile = self
+        if self.memory:
+            tracemalloc.start()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        global _profile
+        self.wall += time.perf_counter() - self.start
+        if self.memory:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        _profile = self.previous
+        if self.report:
+            print(self.summary())
+
+    def add(self, kind, name, start):
+        '''
+        This is the function to count one call of `name` that started at the time `start` (from time.perf_counter).
+        '''
+        key = (kind, name)
+        self.calls[key] = self.calls.get(key, 0) + 1
+        self.times[key] = self.times.get(key, 0.0) + time.perf_counter() - start
+
+    def call(self, kind, name, fun, *args):
+        '''
+        This is the function to call fun(*args), and count and time the call.
+        '''
+        start = time.perf_counter()
+        result = fun(*args)
+        self.add(kind, name, start)
+        return result
+
+    def summary(self):
+        '''
+        This is the function to make the summary table: the calls, the total time, the time per call and the share of the wall time of each entry.
+        '''
+        kinds = ('rhs', 'term', 'derivative', 'transform')
+        lines = ['Profile of PDEsolver: wall time {:.4f} s'.format(self.wall) +
+                 ('' if self.peak is None else ', peak memory {:.2f} MB'.format(self.peak/1e6)),
+                 '{:<12}{:<28}{:>10}{:>14}{:>16}{:>9}'.format('kind', 'name', 'calls', 'total [s]', 'per call [us]', '% wall')]
+        for key in sorted(self.calls, key=lambda key: (kinds.index(key[0]), -self.times[key])):
+            lines.append('{:<12}{:<28}{:>10}{:>14.4f}{:>16.2f}{:>9.1f}'.format(key[0], key[1], self.calls[key], self.times[key],
+                         1e6*self.times[key]/self.calls[key], 100*self.times[key]/self.wall if self.wall else 0.0))
+        other = self.wall - sum(seconds for key, seconds in self.times.items() if key[0] == 'rhs')
+        lines.append('{:<12}{:<28}{:>10}{:>14.4f}{:>16}{:>9.1f}'.format('other', 'integrator and python', '', other, '',
+                     100*other/self.wall if self.wall else 0.0))
+        return '\n'.join(lines)
+
+# FFT backends, selected on create_grid
+def _to_out(result, out):
+    '''
+    This function copies the result of a transform into the array `out`, if it is given.
+    '''
+    if out is None:
+        return result
+    np.copyto(out, result)
+    return out
+
+# numpy >= 2.0 can write the transforms directly into an `out` array
+_numpy_fft_out = np.lib.NumpyVersion(np.__version__) >= '2.0.0'
+
+class _numpy_backend:
+    '''
+    The numpy.fft transforms over the given axes (the grid axes, which are the last axes of the array).
+    If `out` is given, the result is written into it (directly for numpy >= 2.0).
+    '''
+    def __init__(self, workers=None):
+        self.workers = None
+
+    def rfftn(self, f, axes, out=None):
+        if out is not None and _numpy_fft_out:
+            return np.fft.rfftn(f, axes=axes, out=out)
+        return _to_out(np.fft.rfftn(f, axes=axes), out)
+
+    def irfftn(self, fhat, s, axes, out=None):
+        if out is not None and _numpy_fft_out:
+            return np.fft.irfftn(fhat, s=s, axes=axes, out=out)
+        return _to_out(np.fft.irfftn(fhat, s=s, axes=axes), out)
+
+    def fftn(self, f, axes, out=None):
+        if out is not None and _numpy_fft_out:
+            return np.fft.fftn(f, axes=axes, out=out)
+        return _to_out(np.fft.fftn(f, axes=axes), out)
+
+    def ifftn(self, fhat, axes, out=None):
+        if out is not None and _numpy_fft_out:
+            return np.fft.ifftn(fhat, axes=axes, out=out)
+        return _to_out(np.fft.ifftn(fhat, axes=axes), out)
+
+class _scipy_backend:
+    '''
+    The scipy.fft transforms, which can use several threads (`workers`) for each transform.
+    '''
+    def __init__(self, workers=None):
+        self.workers = workers
+
+    def rfftn(self, f, axes, out=None):
+        return _to_out(scipy.fft.rfftn(f, axes=axes, workers=self.workers), out)
+
+    def irfftn(self, fhat, s, axes, out=None):
+        return _to_out(scipy.fft.irfftn(fhat, s=s, axes=axes, workers=self.workers), out)
+
+    def fftn(self, f, axes, out=None):
+        return _to_out(scipy.fft.fftn(f, axes=axes, workers=self.workers), out)
+
+    def ifftn(self, fhat, axes, out=None):
+        return _to_out(scipy.fft.ifftn(fhat, axes=axes, workers=self.workers), out)
+
+class _pyfftw_backend:
+    '''
+    The FFTW transforms from pyFFTW. An FFTW plan is built the first time a transform is called with a new array shape,
+    and is reused for every later call with the same shape, so the planning is only done once per grid size.
+    The input is copied into the input buffer of the plan, as FFTW may overwrite the input of a transform (e.g. the spectrum of irfftn),
+    so the array of the caller is never changed. The result is copied out of the output buffer of the plan, into `out` if it is given.
+    '''
+    def __init__(self, workers=None):
+        self.workers = workers
+        self.plans = {}
+
+    def plan(self, kind, shape, dtype, axes, s=None):
+        '''
+        This is the function to find the stored FFTW plan of a transform, or build it on the first call.
+        '''
+        key = (kind, shape, np.dtype(dtype).str, axes, s)
+        if key not in self.plans:
+            a = pyfftw.empty_aligned(shape, dtype=dtype)
+            builder = getattr(pyfftw.builders, kind)
+            self.plans[key] = builder(a, s=s, axes=axes, threads=self.workers or 1)
+        return self.plans[key]
+
+    def execute(self, plan, a):
+        '''
+        This is the function to run a plan on a copy of a in the input buffer of the plan.
+        '''
+        plan.input_array[...] = a
+        return plan()
+
+    def rfftn(self, f, axes, out=None):
+        result = self.execute(self.plan('rfftn', np.shape(f), np.result_type(f, np.float32), axes), f)
+        return result.copy() if out is None else _to_out(result, out)
+
+    def irfftn(self, fhat, s, axes, out=None):
+        result = self.execute(self.plan('irfftn', np.shape(fhat), np.result_type(fhat, np.complex64), axes, s), fhat)
+        return result.copy() if out is None else _to_out(result, out)
+
+    def fftn(self, f, axes, out=None):
+        result = self.execute(self.plan('fftn', np.shape(f), np.result_type(f, np.complex64), axes), f)
+        return result.copy() if out is None else _to_out(result, out)
+
+    def ifftn(self, fhat, axes, out=None):
+        result = self.execute(self.plan('ifftn', np.shape(fhat), np.result_type(fhat, np.complex64), axes), fhat)
+        return result.copy() if out is None else _to_out(result, out)
+
+_backends = {'numpy': _numpy_backend, 'scipy': _scipy_backend, 'pyfftw': _pyfftw_backend}
+
+# Dealiasing masks, functions of the wavenumber relative to the largest (Nyquist) wavenumber of the axis
+_dealias_masks = {
+    None: None,
+    '2/3': lambda k: (k < 2/3).astype(float),              # the 2/3-rule truncation
+    'exp': lambda k: np.exp(-36*k**36),                     # the exponential filter of Hou & Li (2007)
+}
+
+def _lru_store(cache, key, value, size):
+    '''
+    This function stores value in the cache (an OrderedDict, from the least to the most recently used entry),
+    and removes the least recently used entries so that at most `size` entries are kept. It returns the value.
+    '''
+    cache[key] = value
+    while len(cache) > size:
+        cache.popitem(last=False)
+    return value
+
+# Precisions of create_grid: the dtype of the RHS functions (derivatives, buffers and outputs) and the dtype of the time integration
+_precisions = {
+    'float64': (np.float64, np.float64),
+    'float32': (np.float32, np.float32),
+    'mixed': (np.float32, np.float64),                       # single precision RHS, double precision time integration
+}
+
+def _precision(dtype):
+    '''
+    This function returns the name of the precision of the dtype option of create_grid ('float64', 'float32' or 'mixed'), or None if it is not one of them.
+    '''
+    if isinstance(dtype, str) and dtype in _precisions:
+        return dtype
+    try:
+        name = np.dtype(dtype).name
+    except TypeError:
+        return None
+    return name if name in _precisions else None
+
 # Spatial Domain
 class create_grid:
     '''
     This is a class that creates the spatial grid of the PDE.
     This class will store two numpy arrays: the physical grid `x` and the Fourier grid `wavenumber`. 
     The two grids will be calculated once the class is called, and there will be no repeated calculation in later computations.
+    The half-spectrum Fourier grid `rwavenum` (non-negative wavenumbers only) is also stored for real-valued functions.
+    The class also stores a dictionary `multipliers` of the spectral derivative multipliers (i*wavenumber)**order, one per derivative order,
+    and the same for the half spectrum in `rmultipliers`. The ETDRK4 coefficients of each linear operator and time step are stored in `etdrk4`,
+    and the fused operators of each equation from compose_eq (and its parameters) in `fused`. These two caches only keep the `cache_size`
+    (default 8) most recently used entries, so a scan over many parameter values does not keep the arrays of every value on the grid.
+    Each multiplier is only calculated the first time its order is requested, and is reused in all later derivative calculations.
+    The FFT backend is 'numpy' (default), 'scipy' (scipy.fft, multithreaded with `workers`) or 'pyfftw' (FFTW plans built once per array shape,
+    multithreaded with `workers`, only if pyFFTW is installed). All transforms of the grid functions go through the methods rfft, irfft, fft and ifft.
+    The work buffers of the derivative and RHS functions are stored in `buffers` and reused in every call, so that these functions do not allocate
+    new temporary arrays. Because of these shared buffers, one grid should not be used by several threads at the same time.
+
+    For a 2D or 3D periodic grid, `length` and `num_of_points` are tuples with one value per axis, e.g. create_grid((10,10),(128,128)).
+    Then `x`, `wavenum` and `rwavenum` are tuples with one array per axis, shaped to broadcast against each other (like numpy.ogrid),
+    so the full meshgrids are never stored. The half spectrum is along the last axis.
+    The Laplacian `laplacian` and the gradient `gradient` (one multiplier per axis) in the half spectrum are precomputed for every grid.
+
+    dealias selects the treatment of the aliasing error of the nonlinear term of the burger's equation:
+    None (default, no dealiasing), '2/3' (the 2/3-rule: wavenumbers above 2/3 of the largest wavenumber are removed) or
+    'exp' (the exponential filter exp(-36*(κ/κ_max)**36) of Hou & Li 2007). The mask is precomputed in `dealias_mask`, and applied inside the RHS.
+    jit = True uses the Numba-compiled kernels (on a 1D grid, if Numba is installed) for the spectral multiply of the derivative functions
+    and the pointwise combination of the RHS functions, e.g. du/dt = D*u_xx - u*u_x, which are single loops over the arrays
+    instead of one numpy operation (and one pass over the memory) per term. Without Numba, `jit` is False and the numpy operations are used.
+    The kernels are compiled on the first call, which takes a few seconds.
+    dtype is the precision of the grid: 'float64' (default), 'float32' or 'mixed' (numpy dtypes such as np.float32 are also accepted).
+    With 'float32', the multipliers, the work buffers, the transforms and the outputs of the derivative and RHS functions are single precision
+    (float32 and complex64), which halves the memory and the memory traffic, e.g. for the exploration of large ensembles. The relative error
+    of a derivative is then about 1e-6 instead of 1e-15. The time integration of solve_etdrk4 and solve_imex is also single precision,
+    and the snapshot store and the output u.y are float32.
+    With 'mixed', the RHS is single precision as for 'float32', but the state of the time integration (the Fourier coefficients of
+    solve_etdrk4 and solve_imex, and their exponential and implicit operators) is float64, so the rounding errors do not accumulate over the steps.
+    The dtypes are stored in `dtype` and `cdtype` (the RHS) and `state_dtype` and `state_cdtype` (the time integration).
+    Note that solve_ivp always integrates in float64, so with solve_ivp both 'float32' and 'mixed' are mixed precision.
+    The inputs of the class are stored in `settings`, so the same grid can be created again, e.g. when a simulation is resumed from a checkpoint.
     '''
-    def __init__(self, length, num_of_points):
+    def __init__(self, length, num_of_points, backend='numpy', workers=None, dealias=None, jit=False, dtype='float64'):
         try:
-            # Check if tmax and dt are greater than 0
-            if not(isinstance(length, (float, int))) or not(isinstance(num_of_points, (float, int))) or length <= 0 or num_of_points <= 0 :
-                raise ValueError("`length` and `num_of_points` must be numeric values greater than 0.")
+            lengths = tuple(length) if isinstance(length, (tuple, list)) else (length,)
+            points = tuple(num_of_points) if isinstance(num_of_points, (tuple, list)) else (num_of_points,)
+            # Check if length and num_of_points are greater than 0
+            for L, N in zip(lengths, points):
+                if not(isinstance(L, (float, int))) or not(isinstance(N, (float, int))) or L <= 0 or N <= 0 :
+                    raise ValueError("`length` and `num_of_points` must be numeric values greater than 0.")
+            if len(lengths) != len(points) or not 1 <= len(lengths) <= 3:
+                raise ValueError("`length` and `num_of_points` must have the same number of values, one per axis (1 to 3 axes).")
+            if backend not in _backends:
+                raise ValueError("`backend` must be one of {}.".format(list(_backends)))
+            if backend == 'pyfftw' and pyfftw is None:
+                raise ValueError("The 'pyfftw' backend requires the pyFFTW package to be installed.")
+            if dealias not in _dealias_masks:
+                raise ValueError("`dealias` must be one of {}.".format(list(_dealias_masks)))
+            precision = _precision(dtype)
+            if precision is None:
+                raise ValueError("`dtype` must be one of {}.".format(list(_precisions)))
 
-                # self.length = length
-                # self.num_of_points = num_of_points
+            self.length = length
+            self.num_of_points = num_of_points
+            self.settings = dict(length=length, num_of_points=num_of_points, backend=backend, workers=workers, dealias=dealias, jit=jit,
+                                 dtype=precision)
+            self.precision = precision
+            self.dtype = np.dtype(_precisions[precision][0])             # the RHS functions
+            self.cdtype = np.result_type(self.dtype, np.complex64)
+            self.state_dtype = np.dtype(_precisions[precision][1])       # the time integration
+            self.state_cdtype = np.result_type(self.state_dtype, np.complex64)
             
-            def create_x(self):
+            def create_x(length, num_of_points):
                 '''
                 This is the function to find the physical domain x.
                 The input is the length of the physical domain and the number of discretisation points.
@@ -64,7 +387,7 @@ class create_grid:
                 x = np.arange(-length/2,length/2,dx)  # x is the numpy array that begin at -Length/2 and end at Length/2 - dx
                 return x
 
-            def create_wavenum(self):
+            def create_wavenum(length, num_of_points):
                 '''
                 This is the function to find the Fourier domain, discrete wavenumber domain, of a given physical domain x.
                 The output is the Fourier wavenumber domain, a numpy array, kappa.
@@ -73,41 +396,487 @@ class create_grid:
                 kappa = 2*np.pi*np.fft.fftfreq(num_of_points,d=dx)
                 return kappa
 
-            self.x = create_x(self)
-            self.wavenum = create_wavenum(self)
+            def create_rwavenum(length, num_of_points):
+                '''
+                This is the function to find the half-spectrum wavenumber domain used by the real-to-complex transform `rfft`.
+                The output is a numpy array of the num_of_points//2 + 1 non-negative wavenumbers.
+                '''
+                dx = length/num_of_points             # step in the physical domain x
+                kappa = 2*np.pi*np.fft.rfftfreq(num_of_points,d=dx)
+                return kappa
+
+            self.ndim = len(lengths)
+            self.axes = tuple(range(-self.ndim, 0))   # the grid axes are the last axes of an array (leading axes are ensemble members)
+            self.shape = tuple(int(N) for N in points)
+            self.rshape = self.shape[:-1] + (self.shape[-1]//2 + 1,)
+            if self.ndim == 1:
+                self.x = create_x(length, num_of_points)
+                self.wavenum = create_wavenum(length, num_of_points)
+                self.rwavenum = create_rwavenum(length, num_of_points)
+            else:
+                def sparse(a, axis):
+                    '''
+                    Reshape the 1D array a of the given axis, so that it broadcasts against the other axes.
+                    '''
+                    shape = [1]*self.ndim
+                    shape[axis] = len(a)
+                    return a.reshape(shape)
+                self.x = tuple(sparse(create_x(L, N), i) for i, (L, N) in enumerate(zip(lengths, points)))
+                self.wavenum = tuple(sparse(create_wavenum(L, N), i) for i, (L, N) in enumerate(zip(lengths, points)))
+                self.rwavenum = tuple(sparse(create_wavenum(L, N), i) for i, (L, N) in enumerate(zip(lengths[:-1], points[:-1])))
+                self.rwavenum += (sparse(create_rwavenum(lengths[-1], points[-1]), self.ndim - 1),)
+            self.multipliers = {}
+            self.rmultipliers = {}
+            self.etdrk4 = OrderedDict()
+            self.fused = OrderedDict()
+            self.cache_size = 8
+            self.backend = _backends[backend](workers)
+            self.buffers = {}
+
+            # Precomputed Laplacian and gradient operators in the half spectrum
+            self.gradient = tuple(self.multiplier(1, real=True, axis=i) for i in range(self.ndim))
+            self.grad_sum = sum(self.gradient)        # sum of the first derivatives along every axis
+            self.laplacian = -sum(self.wavenumbers(i, real=True)**2 for i in range(self.ndim)).astype(self.dtype)
+            self.laplacian.setflags(write=False)
+
+            # Precomputed dealiasing mask in the half spectrum, the product of the masks of every axis
+            self.dealias = dealias
+            self.dealias_mask = None
+            if dealias is not None:
+                mask = 1
+                for i, (L, N) in enumerate(zip(lengths, points)):
+                    mask = mask*_dealias_masks[dealias](np.abs(self.wavenumbers(i, real=True))/(np.pi*N/L))
+                self.dealias_mask = mask.astype(self.dtype)
+                self.dealias_mask.setflags(write=False)
+
+            # JIT-compiled kernels are only used if Numba is installed, otherwise the numpy operations are used
+            self.jit = bool(jit) and numba is not None and self.ndim == 1
             return
         
         except ValueError as e:
             print("Value Error:", str(e))
             return None
 
+    def wavenumbers(self, axis=-1, real=False):
+        '''
+        This is the function to find the wavenumbers along the given axis (the full spectrum, or the half spectrum if real is True).
+        '''
+        κ = self.rwavenum if real else self.wavenum
+        return κ if self.ndim == 1 else κ[axis]
+
+    def multiplier(self, order, real=False, axis=-1):
+        '''
+        This is the function to find the spectral multiplier (i*wavenumber)**order for the 'order'th derivative along the given axis.
+        The multiplier is calculated on the first request of each order (including fractional orders) and stored in `multipliers`,
+        so repeated calls, e.g. from the RHS functions inside solve_ivp, do not repeat the complex power operation.
+        If real is True, the half-spectrum multiplier on `rwavenum` is returned (stored in `rmultipliers`).
+        The multiplier is calculated in double precision and stored in the complex dtype `cdtype` of the grid.
+        '''
+        cache = self.rmultipliers if real else self.multipliers
+        axis = axis % self.ndim
+        if (order, axis) not in cache:
+            m = ((1j*self.wavenumbers(axis, real))**order).astype(self.cdtype)     # the 'order'th derivative multiplier in the Fourier domain
+            m.setflags(write=False)                          # cached arrays are shared, so protect them from in-place changes
+            cache[(order, axis)] = m
+        return cache[(order, axis)]
+
+    def buffer(self, name, shape, dtype=None):
+        '''
+        This is the function to find the work buffer with the given name, shape and dtype (the default is the real dtype of the grid).
+        The buffer is allocated on the first request and then reused, so its content is only valid until the next call that uses the same name.
+        '''
+        dtype = self.dtype if dtype is None else dtype
+        key = (name, tuple(shape), np.dtype(dtype).str)
+        if key not in self.buffers:
+            self.buffers[key] = np.empty(shape, dtype=dtype)
+        return self.buffers[key]
+
+    def rfft(self, f, axes=None, out=None):
+        '''
+        Real-to-complex Fourier transform of f over the grid axes, using the FFT backend of the grid.
+        '''
+        if _profile is not None:
+            return _profile.call('transform', 'rfft', self.backend.rfftn, f, self.axes if axes is None else axes, out)
+        return self.backend.rfftn(f, self.axes if axes is None else axes, out)
+
+    def irfft(self, fhat, axes=None, out=None):
+        '''
+        Complex-to-real inverse Fourier transform of the half spectrum fhat over the grid axes, using the FFT backend of the grid.
+        '''
+        if _profile is not None:
+            return _profile.call('transform', 'irfft', self.backend.irfftn, fhat, self.shape, self.axes if axes is None else axes, out)
+        return self.backend.irfftn(fhat, self.shape, self.axes if axes is None else axes, out)
+
+    def fft(self, f, axes=None, out=None):
+        '''
+        Complex Fourier transform of f over the grid axes, using the FFT backend of the grid.
+        '''
+        if _profile is not None:
+            return _profile.call('transform', 'fft', self.backend.fftn, f, self.axes if axes is None else axes, out)
+        return self.backend.fftn(f, self.axes if axes is None else axes, out)
+
+    def ifft(self, fhat, axes=None, out=None):
+        '''
+        Complex inverse Fourier transform of fhat over the grid axes, using the FFT backend of the grid.
+        '''
+        if _profile is not None:
+            return _profile.call('transform', 'ifft', self.backend.ifftn, fhat, self.axes if axes is None else axes, out)
+        return self.backend.ifftn(fhat, self.axes if axes is None else axes, out)
+
+
+# Chebyshev grid for bounded (non-periodic) domains
+class chebyshev_grid:
+    '''
+    This is a class that creates a Chebyshev-Gauss-Lobatto grid on the bounded domain [-length/2, length/2], for PDEs that are not periodic.
+    The physical domain `x` has num_of_points points x = -cos(π*j/(num_of_points-1))*length/2, which are clustered at the boundaries.
+    A function f is represented by its Chebyshev coefficients a_k, f(x) = sum of a_k*T_k(2x/length). The coefficients are found by the
+    type-I discrete cosine transform (DCT, scipy.fft.dct) in O(N log N), and the derivatives are found from the coefficients by the
+    recurrence b_(k-1) = b_(k+1) + 2k*a_k in O(N), so no dense differentiation matrix is used.
+
+    The grid is used with the same functions as create_grid: derivative, derivatives, adv_diff_eq and burger_eq (with solve_ivp,
+    solve_ensemble or solve_stream, e.g. method = 'BDF' or 'Radau', as the second derivative on this grid is very stiff).
+    The spectral time steppers (solve_etdrk4, solve_imex, solve_spectral) and jacobian need the diagonal Fourier operators of a periodic grid.
+
+    bc is the pair (left, right) of boundary conditions at x = -length/2 and x = length/2. Each one is ('dirichlet', g) for u = g,
+    ('neumann', g) for u_x = g, or None for no condition (e.g. at the outflow boundary of an advection equation).
+    g is a numeric value or a function g(t), whose time derivative is found by a central difference with the step 1e-6.
+    The RHS functions impose the boundary conditions on du/dt, so that they hold at all times if they hold for the initial condition
+    (use u0 = grid.apply_bc(u0) to make the initial condition satisfy them).
+    bc_method selects how they are imposed: 'bordering' replaces the equations at the boundary points by the boundary conditions,
+    and 'tau' replaces the equations of the highest Chebyshev coefficients by the boundary conditions (the tau method).
+    '''
+    def __init__(self, length, num_of_points, bc=(('dirichlet',0),('dirichlet',0)), bc_method='bordering', workers=None):
+        try:
+            if not(isinstance(length, (float, int))) or not(isinstance(num_of_points, int)) or length <= 0 or num_of_points < 3:
+                raise ValueError("`length` must be a numeric value greater than 0, and `num_of_points` an integer of at least 3.")
+            if bc_method not in ('bordering', 'tau'):
+                raise ValueError("`bc_method` must be 'bordering' or 'tau'.")
+            if len(bc) != 2 or any(c is not None and (len(c) != 2 or c[0] not in ('dirichlet', 'neumann')) for c in bc):
+                raise ValueError("`bc` must be a pair (left, right), each ('dirichlet', g), ('neumann', g) or None.")
+
+            self.length = length
+            self.num_of_points = num_of_points
+            self.settings = dict(length=length, num_of_points=num_of_points, bc=bc, bc_method=bc_method, workers=workers)
+            self.ndim = 1
+            self.axes = (-1,)
+            self.shape = (num_of_points,)
+            self.x = -np.cos(np.pi*np.arange(num_of_points)/(num_of_points - 1))*length/2
+            self.dealias_mask = None
+            self.jit = False
+            self.precision = 'float64'                      # a Chebyshev grid is always double precision
+            self.dtype = self.state_dtype = np.dtype(float)
+            self.cdtype = self.state_cdtype = np.dtype(complex)
+            self.workers = workers
+            self.buffers = {}
+            self.bc = bc
+            self.bc_method = bc_method
+
+            # The boundary conditions as rows acting on the Chebyshev coefficients (tau) or on the values at the grid points (bordering)
+            N = num_of_points - 1
+            k = np.arange(N + 1)
+            conditions = [(side, c) for side, c in zip((-1, 1), bc) if c is not None]
+            rows = np.array([side**k if c[0] == 'dirichlet' else side**(k+1)*k**2*(2/length) for side, c in conditions]).reshape(-1, N + 1)
+            self.values_bc = [c[1] for side, c in conditions]
+            if bc_method == 'tau':
+                replaced = np.arange(N + 1 - len(conditions), N + 1)             # the highest coefficients
+            else:
+                rows = rows @ self.coefficients(np.eye(N + 1)).T                  # the same rows for the values
+                replaced = np.array([0 if side == -1 else N for side, c in conditions], dtype=int)         # the boundary points
+            kept = np.setdiff1d(k, replaced)
+            self.bc_replaced, self.bc_kept = replaced, kept
+            self.bc_inverse = np.linalg.inv(rows[:, replaced]) if len(conditions) else None
+            self.bc_rows = rows[:, kept]
+            return
+
+        except ValueError as e:
+            print("Value Error:", str(e))
+            return None
+
+    def buffer(self, name, shape, dtype=None):
+        '''
+        This is the function to find the work buffer with the given name, shape and dtype (see create_grid.buffer).
+        '''
+        dtype = self.dtype if dtype is None else dtype
+        key = (name, tuple(shape), np.dtype(dtype).str)
+        if key not in self.buffers:
+            self.buffers[key] = np.empty(shape, dtype=dtype)
+        return self.buffers[key]
+
+    def coefficients(self, f):
+        '''
+        This is the function to find the Chebyshev coefficients of f (along the last axis) with one DCT.
+        '''
+        N = self.num_of_points - 1
+        if _profile is not None:
+            a = _profile.call('transform', 'dct', scipy.fft.dct, np.asarray(f)[...,::-1], 1, None, -1, None, False, self.workers)
+        else:
+            a = scipy.fft.dct(np.asarray(f)[...,::-1], type=1, axis=-1, workers=self.workers)
+        a /= N
+        a[...,0] /= 2
+        a[...,N] /= 2
+        return a
+
+    def values(self, a):
+        '''
+        This is the function to find the values at the grid points of the function with the Chebyshev coefficients a, with one DCT.
+        '''
+        a = np.array(a, dtype=float)
+        a[...,1:-1] /= 2
+        if _profile is not None:
+            return _profile.call('transform', 'dct', scipy.fft.dct, a, 1, None, -1, None, True, self.workers)[...,::-1]
+        return scipy.fft.dct(a, type=1, axis=-1, overwrite_x=True, workers=self.workers)[...,::-1]
+
+    def differentiate(self, a):
+        '''
+        This is the function to find the Chebyshev coefficients of the first derivative, given the coefficients a, with the recurrence
+        b_m = sum of 2j*a_j over j = m+1, m+3, ... (halved for m = 0), written as two reversed cumulative sums in O(N).
+        '''
+        c = 2*np.arange(a.shape[-1])*a
+        S = np.empty_like(c)                          # S_j = c_j + c_(j+2) + ...
+        for parity in (0, 1):
+            S[...,parity::2] = np.cumsum(c[...,parity::2][...,::-1], axis=-1)[...,::-1]
+        b = np.zeros_like(a)
+        b[...,:-1] = S[...,1:]
+        b[...,0] /= 2
+        return b*(2/self.length)
+
+    def derivatives(self, f, orders=(1,2), out=None):
+        '''
+        This is the function to find several derivatives of f with one forward transform, as derivatives() on a periodic grid.
+        The output is a tuple of the derivatives at the grid points, written into `out` if it is given.
+        '''
+        for order in orders:
+            if not(isinstance(order, int)) or order < 0:
+                raise ValueError("`order` must be an integer greater than or equal to 0 on a Chebyshev grid.")
+        a = self.coefficients(f)
+        d_a = {0: a}
+        for order in range(1, max(orders) + 1):
+            d_a[order] = self.differentiate(d_a[order - 1])
+        results = [self.values(d_a[order]) for order in orders]
+        if out is None:
+            return tuple(results)
+        for result, d_ord_f in zip(results, out):
+            np.copyto(d_ord_f, result)
+        return tuple(out)
+
+    def _boundary(self, t, derivative):
+        '''
+        The boundary values g(t), or their time derivatives if derivative is True.
+        '''
+        h = 1e-6
+        if derivative:
+            return np.array([(g(t + h) - g(t - h))/(2*h) if callable(g) else 0.0 for g in self.values_bc])
+        return np.array([g(t) if callable(g) else g for g in self.values_bc], dtype=float)
+
+    def _impose(self, v, g):
+        '''
+        This function replaces the values of v (coefficients for tau, values for bordering) at bc_replaced, so that the rows of the
+        boundary conditions give g: rows_replaced @ v_replaced = g - rows_kept @ v_kept.
+        '''
+        if self.bc_inverse is None:
+            return v
+        v[...,self.bc_replaced] = (g - v[...,self.bc_kept] @ self.bc_rows.T) @ self.bc_inverse.T
+        return v
+
+    def apply_bc(self, u, t=0.0):
+        '''
+        This is the function to return a copy of u that satisfies the boundary conditions at the time t, e.g. for the initial condition.
+        '''
+        if self.bc_method == 'tau':
+            return self.values(self._impose(self.coefficients(u), self._boundary(t, False)))
+        return self._impose(np.array(u, dtype=float), self._boundary(t, False))
+
+    def impose(self, t, u, du_dt):
+        '''
+        This is the function to impose the time derivative of the boundary conditions on du/dt (in place), called by the RHS functions.
+        '''
+        if self.bc_inverse is None:
+            return du_dt
+        if self.bc_method == 'tau':
+            du_dt[...] = self.values(self._impose(self.coefficients(du_dt), self._boundary(t, True)))
+        else:
+            self._impose(du_dt, self._boundary(t, True))
+        return du_dt
 
 # Derivative calculation using the pseudo-spectral method
-def derivative(grid, f, order):
+def derivative(grid, f, order, out=None, axis=-1):
     '''
     This is the function for finding the derivative of a function f with domain x, using the pseudo-spectral method. 
     The function f is being transformed to the Fourier basis and then calculate the derivative by multiplying i*wave number.
     The order of derivative can be defined at the beginning as an input.
-    The output is the given order derivative in the physical domain.
+    The output is the given order derivative in the physical domain. If the array `out` is given, the derivative is written into it.
+    For a 2D or 3D grid, the derivative is along the grid axis `axis`.
+    '''
+    if _profile is not None:
+        _profile.add('derivative', 'derivative', time.perf_counter())          # counts the call, the time is in 'derivatives'
+    d_ord_f = derivatives(grid,f,(order,),None if out is None else (out,),axis)
+    if d_ord_f is None:
+        return None
+    return d_ord_f[0]
+
+def derivatives(grid, f, orders=(1,2), out=None, axis=-1):
+    '''
+    This is the function for finding several derivatives of a function f with domain x at once, using the pseudo-spectral method.
+    The function f is transformed to the Fourier basis only once, and every requested order reuses the same spectrum fhat.
+    The orders of derivative are given as a tuple, e.g. orders = (1,2) for the first and second derivatives.
+    The output is a tuple of the derivatives in the physical domain, in the same order as `orders`.
+    Real-valued f (every field solved by this module) uses the real-to-complex transforms rfft/irfft on the half spectrum,
+    which halves the transform cost and memory; complex-valued f uses the full fft/ifft and returns the real part.
+    f may also be a 2D array with one function per row (an ensemble), which is transformed along the last axis in one FFT call.
+    If `out` is given, it is a tuple of arrays (one per order) that the derivatives are written into. 
+    The Fourier domain temporaries always use the work buffers of the grid.
+    For a 2D or 3D grid, the derivatives are along the grid axis `axis`, and f is transformed over all grid axes.
     '''
     try:
-        # Check if tmax and dt are greater than 0
-        if not(type(order)==float or type(order)==int) or order < 0:
-            raise ValueError("`order` must be a numeric value greater than or equal to 0.")
+        # Check if every order is a numeric value greater than or equal to 0
+        for order in orders:
+            if not(type(order)==float or type(order)==int) or order < 0:
+                raise ValueError("`order` must be a numeric value greater than or equal to 0.")
         
-        κ = grid.wavenum                          # wavenumber domain for the function f
-        fhat = np.fft.fft(f)                      # Fourier tranform of f
-        d_ord_fhat = ((1j*κ)**order)*fhat         # the 'order'th derivative of fhat 
-        d_ord_f = np.fft.ifft(d_ord_fhat).real    # the 'order'th derivative of f
-      
-        return d_ord_f
+        if isinstance(grid, chebyshev_grid):
+            return grid.derivatives(f, orders, out)
+        if _profile is not None:
+            return _profile.call('derivative', 'derivatives', _spectral_apply, grid, f, lambda real: [grid.multiplier(order,real,axis) for order in orders], out)
+        return _spectral_apply(grid, f, lambda real: [grid.multiplier(order,real,axis) for order in orders], out)
     
     except ValueError as e:
         print("Value Error:", str(e))
         return None
 
+def laplacian(grid, f, out=None):
+    '''
+    This is the function for finding the Laplacian (the sum of the second derivatives along every axis) of a function f,
+    using the precomputed Laplacian operator of the grid. If the array `out` is given, the Laplacian is written into it.
+    '''
+    return _spectral_apply(grid, f, lambda real: [grid.laplacian if real else sum(grid.multiplier(2,False,i) for i in range(grid.ndim))],
+                           None if out is None else (out,))[0]
+
+def gradient(grid, f, out=None):
+    '''
+    This is the function for finding the gradient (the first derivatives along every axis) of a function f with one forward transform,
+    using the precomputed gradient operator of the grid. The output is a tuple with one derivative per axis.
+    If `out` is given, it is a tuple of arrays (one per axis) that the derivatives are written into.
+    '''
+    return _spectral_apply(grid, f, lambda real: list(grid.gradient) if real else [grid.multiplier(1,False,i) for i in range(grid.ndim)], out)
+
+def _spectral_apply(grid, f, multipliers, out=None):
+    '''
+    This function transforms f to the Fourier domain once, multiplies the spectrum by each Fourier multiplier and transforms each product back.
+    multipliers is a function of `real` (True for the half spectrum of a real f) that returns the list of multipliers.
+    The output is a tuple with one array per multiplier, written into `out` if it is given.
+    '''
+    if np.shape(f)[-grid.ndim:] != grid.shape:
+        f = np.broadcast_to(f, np.broadcast_shapes(np.shape(f), grid.shape))   # e.g. a function of the sparse x of a single axis
+    shape = np.shape(f)
+    real = np.isrealobj(f)
+    f = np.asarray(f, dtype=grid.dtype if real else grid.cdtype)               # the precision of the grid
+    multipliers = multipliers(real)
+    if out is None:
+        out = tuple(np.empty(shape, grid.dtype) for m in multipliers)
+    if real:
+        spectrum = shape[:len(shape)-grid.ndim] + grid.rshape
+        fhat = grid.rfft(f, out=grid.buffer('fhat',spectrum,grid.cdtype))     # half-spectrum Fourier tranform of the real f, calculated once for all orders
+        d_ord_fhat = grid.buffer('d_ord_fhat',spectrum,grid.cdtype)
+        for m, d_ord_f in zip(multipliers, out):
+            if grid.jit:
+                _spectral_multiply(m, fhat.reshape(-1, grid.rshape[-1]), d_ord_fhat.reshape(-1, grid.rshape[-1]))
+            else:
+                np.multiply(m, fhat, out=d_ord_fhat)                            # the 'order'th derivative of fhat
+            grid.irfft(d_ord_fhat, out=d_ord_f)                                 # the 'order'th derivative of f
+    else:
+        fhat = grid.fft(f, out=grid.buffer('fhat',shape,grid.cdtype))          # Fourier tranform of f, calculated once for all orders
+        d_ord_fhat = grid.buffer('d_ord_fhat',shape,grid.cdtype)
+        for m, d_ord_f in zip(multipliers, out):
+            np.multiply(m, fhat, out=d_ord_fhat)
+            np.copyto(d_ord_f, grid.ifft(d_ord_fhat, out=d_ord_fhat).real)
+    return tuple(out)
+
+def _member_param(p, ndim=1):
+    '''
+    This function reshapes a parameter with one value per ensemble member, so that it broadcasts along the grid axes (the last ndim axes) of u.
+    A single numeric value is returned unchanged.
+    '''
+    if np.ndim(p) == 0:
+        return p
+    return np.asarray(p)[(Ellipsis,) + (None,)*ndim]
+
+def _velocity(v, ndim):
+    '''
+    This function returns the advection velocity as a tuple with one component per grid axis.
+    For a 1D grid, v is one component. For a 2D or 3D grid, v is a tuple (or list) of ndim components, or a single component used on every axis.
+    Each component is a numeric value or an array with one value per ensemble member.
+    '''
+    if ndim == 1 or not isinstance(v, (tuple, list)):
+        return (_member_param(v, ndim),)*ndim
+    if len(v) != ndim:
+        raise ValueError("`v` must have one component per axis of the grid.")
+    return tuple(_member_param(v_i, ndim) for v_i in v)
+
+def _check_param(p, name):
+    '''
+    This function checks that a parameter, or every value of a parameter array, is a numeric value greater than or equal to 0.
+    '''
+    p = np.asarray(p)
+    if p.dtype.kind not in 'iuf' or np.any(p < 0):
+        raise ValueError("`{}` must be a numeric value greater than or equal to 0.".format(name))
+
+def _rhs_operators(grid, u, sum_gradient=False):
+    '''
+    This function returns the Laplacian and the gradient of u for the RHS functions, from one forward transform,
+    written into the work buffers of the grid. If sum_gradient is True, the sum of the gradient components is returned instead of the gradient.
+    In 1D, these are the second and first derivatives. On a Chebyshev grid, they are found from one DCT of u.
+    '''
+    shape = np.shape(u)
+    if isinstance(grid, chebyshev_grid):
+        dd_u, d_u = grid.derivatives(u,(2,1),(grid.buffer('dd_u',shape),grid.buffer('d_u',shape)))
+        return dd_u, (d_u,)
+    if sum_gradient or grid.ndim == 1:
+        multipliers = lambda real: [grid.laplacian, grid.grad_sum] if real else [sum(grid.multiplier(o,False,i) for i in range(grid.ndim)) for o in (2,1)]
+        dd_u, d_u = _spectral_apply(grid,u,multipliers,(grid.buffer('dd_u',shape),grid.buffer('d_u',shape)))
+        return dd_u, (d_u,)
+    multipliers = lambda real: ([grid.laplacian] + list(grid.gradient)) if real else \
+        [sum(grid.multiplier(2,False,i) for i in range(grid.ndim))] + [grid.multiplier(1,False,i) for i in range(grid.ndim)]
+    out = (grid.buffer('dd_u',shape),) + tuple(grid.buffer('d_u{}'.format(i),shape) for i in range(grid.ndim))
+    result = _spectral_apply(grid,u,multipliers,out)
+    return result[0], result[1:]
+
+# Optional JIT-compiled kernels of the RHS functions and the derivative functions (used if create_grid(...,jit=True) and Numba is installed)
+def _rows(p, rows):
+    '''
+    This function returns a parameter (a numeric value or one value per ensemble member) as a 1D array with one value per row of the kernels.
+    '''
+    return np.broadcast_to(np.ravel(p).astype(float), (rows,))
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _linear_combination(a, x, b, y, out):
+        '''
+        out = a*x - b*y in one pass over the 2D arrays (rows x grid points), where a and b have one value per row.
+        '''
+        for i in range(x.shape[0]):
+            for j in range(x.shape[1]):
+                out[i, j] = a[i]*x[i, j] - b[i]*y[i, j]
+
+    @numba.njit(cache=True)
+    def _product_combination(a, x, u, y, out):
+        '''
+        out = a*x - u*y in one pass over the 2D arrays (rows x grid points), where a has one value per row.
+        '''
+        for i in range(x.shape[0]):
+            for j in range(x.shape[1]):
+                out[i, j] = a[i]*x[i, j] - u[i, j]*y[i, j]
+
+    @numba.njit(cache=True)
+    def _spectral_multiply(m, fhat, out):
+        '''
+        out = m*fhat for the 2D spectra (rows x wavenumbers), where the multiplier m is the same for every row.
+        '''
+        for i in range(fhat.shape[0]):
+            for j in range(fhat.shape[1]):
+                out[i, j] = m[j]*fhat[i, j]
+
 # Advection-Diffusion equation
-def adv_diff_eq(t,u,grid,D,v):
+def adv_diff_eq(t,u,grid,D,v,out=None):
     '''
     This function is for deriving the advection diffusion equation with RHS fully solved.
     This function will be implemented in the below integration function.
@@ -115,34 +884,1038 @@ def adv_diff_eq(t,u,grid,D,v):
     grid is the grid of spatial domain, containing the physical domain and fourier domain.
     D is the diffusion coefficient.
     v is the advection velocity.
+    For an ensemble, u is a 2D array (members x grid points) and D and v may be arrays with one value per member.
+    If the array `out` is given, du/dt is written into it. The derivatives are kept in the work buffers of the grid.
+    For a 2D or 3D grid, the equation is du/dt = D*laplacian(u) - v.gradient(u), where v is a tuple with one component per axis (or a single value for every axis).
     '''
-    d_u = derivative(grid,u,1)
-    dd_u = derivative(grid,u,2)
+    profile = _profile                              # None unless profiling is on
+    if profile is not None:
+        start = time.perf_counter()
+    dd_u, d_u = _rhs_operators(grid,u)
+    if profile is not None:
+        profile.add('term', 'spectral derivatives', start)
+        term = time.perf_counter()
+    D, v = _member_param(D,grid.ndim), _velocity(v,grid.ndim)
     
-    du_dt = D*dd_u - v*d_u
+    du_dt = np.empty(np.shape(u), grid.dtype) if out is None else out
+    if grid.jit and du_dt.flags.c_contiguous:
+        N = grid.shape[-1]
+        rows = du_dt.size//N
+        _linear_combination(_rows(D, rows), dd_u.reshape(rows, N), _rows(v[0], rows), d_u[0].reshape(rows, N), du_dt.reshape(rows, N))
+        if profile is not None:
+            profile.add('term', 'D*u_xx - v*u_x (jit)', term)
+            profile.add('rhs', 'adv_diff_eq', start)
+        return du_dt
+    np.multiply(D, dd_u, out=du_dt)                 # du_dt = D*dd_u - v*d_u, without temporaries
+    if profile is not None:
+        profile.add('term', 'D*u_xx', term)
+        term = time.perf_counter()
+    for v_i, d_u_i in zip(v, d_u):
+        np.multiply(v_i, d_u_i, out=d_u_i)
+        np.subtract(du_dt, d_u_i, out=du_dt)
+    if isinstance(grid, chebyshev_grid):
+        grid.impose(t, u, du_dt)                    # the boundary conditions of a bounded domain
+    if profile is not None:
+        profile.add('term', '-v*u_x', term)
+        profile.add('rhs', 'adv_diff_eq', start)
     return du_dt
 
-def burger_eq(t,u,grid,D):
+def burger_eq(t,u,grid,D,out=None):
     '''
     This function is for deriving the burger's equation with rhs fully solved.
     t is the temporal domain, which should take the form t = time_domain(tmax,dt).
     grid is the grid of spatial domain, containing the physical domain and fourier domain.
     D is the diffusion coefficient.
+    For an ensemble, u is a 2D array (members x grid points) and D may be an array with one value per member.
+    If the array `out` is given, du/dt is written into it. The derivatives are kept in the work buffers of the grid.
+    For a 2D or 3D grid, the equation is du/dt = D*laplacian(u) - u*(sum of the first derivatives along every axis).
+    If the grid has a dealiasing mask, it is applied to u and to the nonlinear product u*u_x in the Fourier domain.
     '''
-    d_u = derivative(grid,u,1)
-    dd_u = derivative(grid,u,2)
+    profile = _profile                              # None unless profiling is on
+    if profile is not None:
+        start = time.perf_counter()
+    if grid.dealias_mask is not None:
+        du_dt = _burger_dealiased(u,grid,D,out)
+        if profile is not None:
+            profile.add('rhs', 'burger_eq', start)
+        return du_dt
+    dd_u, (d_u,) = _rhs_operators(grid,u,sum_gradient=True)
+    if profile is not None:
+        profile.add('term', 'spectral derivatives', start)
+        term = time.perf_counter()
+    D = _member_param(D,grid.ndim)
     
-    du_dt = D*dd_u - u*d_u
+    du_dt = np.empty(np.shape(u), grid.dtype) if out is None else out
+    if grid.jit and du_dt.flags.c_contiguous:
+        N = grid.shape[-1]
+        rows = du_dt.size//N
+        _product_combination(_rows(D, rows), dd_u.reshape(rows, N), np.reshape(u, (rows, N)), d_u.reshape(rows, N), du_dt.reshape(rows, N))
+        if profile is not None:
+            profile.add('term', 'D*u_xx - u*u_x (jit)', term)
+            profile.add('rhs', 'burger_eq', start)
+        return du_dt
+    np.multiply(D, dd_u, out=du_dt)                 # du_dt = D*dd_u - u*d_u, without temporaries
+    if profile is not None:
+        profile.add('term', 'D*u_xx', term)
+        term = time.perf_counter()
+    np.multiply(u, d_u, out=d_u)
+    np.subtract(du_dt, d_u, out=du_dt)
+    if isinstance(grid, chebyshev_grid):
+        grid.impose(t, u, du_dt)                    # the boundary conditions of a bounded domain
+    if profile is not None:
+        profile.add('term', '-u*u_x', term)
+        profile.add('rhs', 'burger_eq', start)
     return du_dt
 
+def _burger_dealiased(u,grid,D,out=None):
+    '''
+    This function is the RHS of the burger's equation with the dealiasing mask of the grid.
+    The mask is applied to a copy of the spectrum of u, which is only used to form the nonlinear product, and to the spectrum of the product,
+    so the linear term D*u_xx is not filtered (as in _burger_nonlinear of the spectral time steppers).
+    du/dt is assembled in the Fourier domain with one inverse transform.
+    '''
+    profile = _profile                                                   # None unless profiling is on
+    if profile is not None:
+        start = time.perf_counter()
+    shape = np.shape(u)
+    spectrum = shape[:len(shape)-grid.ndim] + grid.rshape
+    uhat = grid.rfft(np.asarray(u, grid.dtype), out=grid.buffer('fhat',spectrum,grid.cdtype))
+    uhat_f = np.multiply(grid.dealias_mask, uhat, out=grid.buffer('uhat_f',spectrum,grid.cdtype))   # the dealiased spectrum of u
+    work = grid.buffer('d_ord_fhat',spectrum,grid.cdtype)
+    u_f = grid.irfft(uhat_f, out=grid.buffer('dd_u',shape))             # the dealiased u
+    np.multiply(grid.grad_sum, uhat_f, out=work)
+    d_u = grid.irfft(work, out=grid.buffer('d_u',shape))                # the dealiased u_x
+    if profile is not None:
+        profile.add('term', 'spectral derivatives', start)
+        term = time.perf_counter()
+    np.multiply(u_f, d_u, out=d_u)
+    product = grid.rfft(d_u, out=work)                                   # the spectrum of u*u_x
+    np.multiply(grid.dealias_mask, product, out=product)
+    if profile is not None:
+        profile.add('term', '-u*u_x (dealiased)', term)
+        term = time.perf_counter()
+    np.multiply(uhat, grid.laplacian, out=uhat)
+    np.multiply(_member_param(D,grid.ndim), uhat, out=uhat)
+    if profile is not None:
+        profile.add('term', 'D*u_xx', term)
+    np.subtract(uhat, product, out=uhat)                                 # the spectrum of D*u_xx - u*u_x
+    du_dt = np.empty(shape, grid.dtype) if out is None else out
+    return grid.irfft(uhat, out=du_dt)
+
+# Exact spectral solution of the Advection-Diffusion equation
+def adv_diff_exact(t,grid,u0,D,v,store=None):
+    '''
+    This function solves the advection diffusion equation exactly in the Fourier domain, without a numerical time integration.
+    Since the equation is linear with constant D and v, each Fourier coefficient evolves as uhat(t) = uhat(0)*exp((-D*κ**2 - i*v*κ)*t),
+    so the solution at every requested time only costs one inverse transform.
+    t is the temporal domain, which should take the form t = time_domain(tmax,dt).
+    grid is the grid of spatial domain, containing the physical domain and fourier domain.
+    u0 is the initial condition.
+    D is the diffusion coefficient.
+    v is the advection velocity.
+    For an ensemble, u0 is a 2D array (members x grid points), D and v may have one value per member, and u.y has the shape (members, grid points, time).
+    If a snapshot_store is given, the solution is written to it one time at a time, instead of being kept in memory.
+
+    Returns:
+    u: the solution with the same attributes `t` and `y` as the output of solve_ivp, where each column of u.y is the solution at time t.
+    '''
+    try:
+        _check_param(D, 'D')
+
+        t = np.asarray(t, dtype=float)
+        L = _adv_diff_split(grid,D,v)                                          # linear operator D*(iκ)**2 - v*(iκ) in the Fourier domain
+        L = L[0] + L[1]
+        u0hat = grid.rfft(np.asarray(u0, grid.state_dtype))                   # Fourier transform of the initial condition
+        if store is None:
+            uhat = u0hat[...,None]*np.exp(L[...,None]*t)                       # the exact Fourier coefficients at every time t
+            y = grid.irfft(uhat,axes=tuple(a-1 for a in grid.axes)).astype(grid.dtype, copy=False)   # the solution in the physical domain, one column per time
+        else:
+            store.create(np.shape(u0), t, grid.dtype)
+            for i, t_i in enumerate(t):
+                store.write(i, grid.irfft(u0hat*np.exp(L*t_i)))
+            store.flush()
+            y = store.y
+
+        return OptimizeResult(t=t, y=y, nfev=0, status=0, message='Exact spectral propagation.', success=True)
+
+    except ValueError as e:
+        print("Value Error:", str(e))
+        return None
+
+# Linear and nonlinear parts of the RHS functions, used by the spectral time steppers
+def _burger_nonlinear(grid, uhat):
+    '''
+    This function returns the Fourier transform of the nonlinear term -u*u_x of the burger's equation, given the half spectrum uhat of u.
+    If the grid has a dealiasing mask, it is applied to uhat and to the spectrum of the product.
+    '''
+    if _profile is not None:
+        return _profile.call('rhs', 'burger nonlinear (spectral)', _burger_nonlinear_term, grid, uhat)
+    return _burger_nonlinear_term(grid, uhat)
+
+def _burger_nonlinear_term(grid, uhat):
+    '''
+    The calculation of _burger_nonlinear, in the precision of the RHS functions of the grid.
+    '''
+    uhat = uhat.astype(grid.cdtype, copy=False)
+    if grid.dealias_mask is not None:
+        uhat = grid.dealias_mask*uhat
+    u = grid.irfft(uhat)
+    d_u = grid.irfft(grid.grad_sum*uhat)
+    if grid.dealias_mask is not None:
+        return grid.dealias_mask*grid.rfft(-u*d_u)
+    return grid.rfft(-u*d_u)
+
+def _adv_diff_split(grid, D, v):
+    '''
+    The advection diffusion equation is linear: stiff diffusion D*(iκ)**2, non-stiff advection -v*(iκ) and no nonlinear term.
+    '''
+    advection = sum(v_i*g for v_i, g in zip(_velocity(v,grid.ndim), grid.gradient))
+    return _member_param(D,grid.ndim)*grid.laplacian, -advection, None
+
+def _burger_split(grid, D):
+    '''
+    The burger's equation has the stiff diffusion D*(iκ)**2, no linear advection and the nonlinear term -u*u_x.
+    '''
+    return _member_param(D,grid.ndim)*grid.laplacian, 0, _burger_nonlinear
+
+# For each RHS function: a function of (grid, *parameters) returning (stiff linear operator, non-stiff linear operator, nonlinear term)
+_splits = {adv_diff_eq: _adv_diff_split, burger_eq: _burger_split}
+
+# Declarative composition of new equations
+_term_pattern = re.compile(r'^([+-]?)(?:(?!u\*)([A-Za-z]\w*|\d+\.?\d*(?:e[+-]?\d+)?)\*)?(u\*)?u(?:_(x+))?$')
+
+def _parse_term(term):
+    '''
+    This function parses one term of compose_eq, e.g. 'D*u_xx', '-v*u_x', '-u*u_x', '-u_xxxx' or '-6*u*u_x'.
+    It returns (sign, coefficient, nonlinear, order), where the coefficient is a number, the name of a parameter, or 1.
+    '''
+    match = _term_pattern.match(term.replace(' ', ''))
+    if match is None:
+        raise ValueError("The term '{}' must take the form [sign][coefficient*][u*]u[_x...], e.g. 'D*u_xx', '-u*u_x' or '-u_xxxx'.".format(term))
+    sign, coefficient, nonlinear, xs = match.groups()
+    if coefficient is None:
+        coefficient = 1.0
+    elif not coefficient[0].isalpha():
+        coefficient = float(coefficient)
+    return (-1.0 if sign == '-' else 1.0), coefficient, nonlinear is not None, len(xs or '')
+
+def _composed_operators(grid, terms, params):
+    '''
+    This function returns the fused operators of the parsed terms of a composed equation, for the given parameter values:
+    the stiff (order >= 2) and non-stiff (order < 2) linear multipliers, and a dictionary {order: (coefficient, multiplier)} of the nonlinear terms
+    coefficient*u*(derivative of u), where the terms with the same order are added together. The sum of all linear terms, the one multiplier
+    of the RHS, is also returned (in the complex dtype of the grid). They are calculated once per grid and parameter values, and stored in `grid.fused`.
+    Composed equations are only available on a 1D periodic grid.
+    '''
+    if isinstance(grid, chebyshev_grid) or grid.ndim != 1:
+        raise ValueError("An equation from compose_eq() is only available on a 1D periodic grid from create_grid.")
+    key = (terms, tuple((np.shape(p), np.asarray(p).tobytes()) for p in params))
+    if key in grid.fused:
+        grid.fused.move_to_end(key)                          # the most recently used entry
+    else:
+        names = _term_names(terms)
+        stiff, nonstiff, nonlinear = 0, 0, {}
+        for sign, coefficient, is_nonlinear, order in terms:
+            c = sign*_member_param(params[names.index(coefficient)] if isinstance(coefficient, str) else coefficient)
+            m = grid.multiplier(order, real=True)
+            if is_nonlinear:
+                nonlinear[order] = (nonlinear[order][0] + c if order in nonlinear else c, m)
+            elif order >= 2:
+                stiff = stiff + c*m
+            else:
+                nonstiff = nonstiff + c*m
+        linear = np.asarray(stiff + nonstiff).astype(grid.cdtype)
+        _lru_store(grid.fused, key, (stiff, nonstiff, linear, nonlinear), grid.cache_size)
+    return grid.fused[key]
+
+def _term_names(terms):
+    '''
+    The names of the parameters of the parsed terms, in the order of their first appearance.
+    '''
+    names = []
+    for _, coefficient, _, _ in terms:
+        if isinstance(coefficient, str) and coefficient not in names:
+            names.append(coefficient)
+    return names
+
+def compose_eq(terms, name='composed_eq'):
+    '''
+    This function composes the RHS function of a new equation du/dt = sum of terms on a 1D grid, without writing it by hand like burger_eq.
+    Each term is a string [sign][coefficient*][u*]u[_x...]: a linear derivative term such as 'D*u_xx', '-v*u_x' or '-u_xxxx',
+    or a nonlinear term such as '-u*u_x'. The coefficient is a number or the name of a parameter, e.g. the Kuramoto-Sivashinsky equation is
+    compose_eq(['-u_xx','-u_xxxx','-u*u_x'], 'ks_eq') and the KdV equation is compose_eq(['-6*u*u_x','-u_xxx'], 'kdv_eq').
+    The parameters are passed after the grid, in the order of their first appearance (listed in `fun.params`),
+    e.g. compose_eq(['D*u_xx','-v*u_x']) is the same equation as adv_diff_eq with args = (grid,D,v).
+
+    The returned function fun(t,u,grid,*params,out=None) is used in the same way as burger_eq. It transforms u to the Fourier domain once,
+    all linear terms are applied as one fused multiplier (precomputed once per grid and parameter values), and each nonlinear term
+    only adds one inverse transform. Ensembles (parameters with one value per member) and the dealiasing mask of the grid are supported.
+    The equation is also registered for solve_etdrk4, solve_imex and solve_spectral: the linear terms of order 2 or higher are the stiff part,
+    and the linear terms of order 0 and 1 the non-stiff part. To resume a checkpoint of a composed equation, compose it again with the same name first.
+    '''
+    try:
+        if isinstance(terms, str) or len(terms) == 0:
+            raise ValueError("`terms` must be a list of terms, e.g. ['D*u_xx','-u*u_x'].")
+        source = [term.replace(' ', '') for term in terms]
+        terms = tuple(_parse_term(term) for term in terms)
+    except ValueError as e:
+        print("Value Error:", str(e))
+        return None
+
+    def fun(t, u, grid, *params, out=None):
+        profile = _profile                          # None unless profiling is on
+        if profile is not None:
+            start = time.perf_counter()
+        _, _, linear, nonlinear = _composed_operators(grid, terms, params)
+        shape = np.shape(u)
+        spectrum = shape[:-1] + grid.rshape
+        uhat = grid.rfft(np.asarray(u, grid.dtype), out=grid.buffer('fhat',spectrum,grid.cdtype))   # the only forward transform
+        work = grid.buffer('d_ord_fhat',spectrum,grid.cdtype)
+        du_dt = np.empty(shape, grid.dtype) if out is None else out
+        if grid.dealias_mask is None:
+            np.multiply(linear, uhat, out=work)                      # all linear terms at once
+            grid.irfft(work, out=du_dt)
+            for order, (c, m) in nonlinear.items():
+                np.multiply(m, uhat, out=work)
+                d_u = grid.irfft(work, out=grid.buffer('d_u',shape))
+                np.multiply(u, d_u, out=d_u)
+                np.multiply(c, d_u, out=d_u)
+                np.add(du_dt, d_u, out=du_dt)
+        else:
+            # dealiased: the nonlinear products are formed from the masked u, and their spectrum is masked too,
+            # while the linear terms use the unmasked spectrum (as in the split of the spectral time steppers)
+            if nonlinear:
+                uhat_f = np.multiply(grid.dealias_mask, uhat, out=grid.buffer('uhat_f',spectrum,grid.cdtype))
+                u_f = grid.irfft(uhat_f, out=grid.buffer('dd_u',shape))
+                product = grid.buffer('product',shape)
+                product[...] = 0
+                for order, (c, m) in nonlinear.items():
+                    np.multiply(m, uhat_f, out=work)
+                    d_u = grid.irfft(work, out=grid.buffer('d_u',shape))
+                    np.multiply(u_f, d_u, out=d_u)
+                    np.multiply(c, d_u, out=d_u)
+                    np.add(product, d_u, out=product)
+                product_hat = grid.rfft(product, out=work)
+                np.multiply(grid.dealias_mask, product_hat, out=product_hat)
+                np.multiply(linear, uhat, out=uhat)
+                np.add(uhat, product_hat, out=uhat)
+            else:
+                np.multiply(linear, uhat, out=uhat)
+            grid.irfft(uhat, out=du_dt)
+        if profile is not None:
+            profile.add('rhs', name, start)
+        return du_dt
+
+    def split(grid, *params):
+        '''
+        The stiff and non-stiff linear operators and the nonlinear terms of the composed equation, for the spectral time steppers.
+        '''
+        stiff, nonstiff, _, nonlinear_terms = _composed_operators(grid, terms, params)
+
+        def nonlinear(grid, uhat):
+            '''
+            The Fourier transform of the nonlinear terms, given the half spectrum uhat of u.
+            '''
+            uhat = uhat.astype(grid.cdtype, copy=False)                        # the precision of the RHS
+            if grid.dealias_mask is not None:
+                uhat = grid.dealias_mask*uhat
+            u = grid.irfft(uhat)
+            product = sum(c*u*grid.irfft(m*uhat) for c, m in nonlinear_terms.values())
+            if grid.dealias_mask is not None:
+                return grid.dealias_mask*grid.rfft(product)
+            return grid.rfft(product)
+
+        return stiff, nonstiff, (nonlinear if nonlinear_terms else None)
+
+    fun.__name__ = fun.__qualname__ = name
+    fun.__doc__ = "The RHS of du/dt = {}, with the inputs (t,u,grid{}) (composed with compose_eq).".format(
+        ' + '.join(source), ''.join(','+p for p in _term_names(terms)))
+    fun.params = tuple(_term_names(terms))
+    fun.terms = terms
+    _splits[fun] = split
+    return fun
+
+def _output(shape, t, store=None, dtype=float):
+    '''
+    This function returns the output array y of a solver, and a function write(i,u) that stores the solution u at the time t[i].
+    Without a store, y is an array in memory with one column per time. With a snapshot_store, each solution is written to the disk
+    as soon as it is calculated, and y is the lazy (memory-mapped) view of the store. dtype is the dtype of the solution in y.
+    '''
+    if store is None:
+        y = np.empty(shape + (len(t),), dtype)
+        def write(i, u):
+            y[...,i] = u
+        return y, write
+    store.create(shape, t, dtype)
+    return store.y, store.write
+
+def _start(method, fun, args, t, dt, u0, store, checkpoint):
+    '''
+    This function starts the output of solve_etdrk4 or solve_imex, and returns y, the function write(i,u) (see _output) and the saved state.
+    For a new integration the state is None and the initial condition is written. If the checkpoint has a saved state (see resume),
+    the solution that was already written is restored instead: from the checkpoint itself, or by opening the snapshot store again.
+    '''
+    state = None if checkpoint is None else checkpoint.state
+    dtype = args[0].dtype                                      # the solution is stored in the precision of the grid
+    if state is None:
+        y, write = _output(np.shape(u0), t, store, dtype)
+        write(0, u0)
+    elif store is None:
+        y, write = _output(np.shape(u0), t, None, dtype)
+        y[...,:state['i']+1] = state['y']
+    else:
+        store.open('r+')
+        y, write = store.y, store.write
+    if checkpoint is not None:
+        checkpoint.start(method, fun, args, t, dt, u0, store)
+    return y, write, state
+
+def _state_operator(grid, op):
+    '''
+    This function returns a linear operator of a split (see _splits) in the dtype of the time integration of the grid.
+    '''
+    return np.asarray(op).astype(grid.state_cdtype if np.iscomplexobj(op) else grid.state_dtype, copy=False)
+
+def _output_steps(t, dt):
+    '''
+    This function splits every interval between two output times t into equal steps no larger than dt.
+    It returns a list of (number of steps, step size) for each interval.
+    '''
+    intervals = np.diff(t)
+    num_of_steps = np.maximum(np.ceil(intervals/dt - 1e-9), 1).astype(int)
+    return list(zip(num_of_steps, intervals/num_of_steps))
+
+def _operator_key(L):
+    '''
+    The key of a linear operator in `grid.etdrk4`: a hash of its values, shape and dtype, which is much smaller than the operator itself.
+    '''
+    L = np.ascontiguousarray(L)
+    return hashlib.sha1(L.tobytes()).hexdigest() + str(L.shape) + L.dtype.str
+
+def _etdrk4_coefficients(grid, L, h, M=32, operator=None):
+    '''
+    This function calculates the ETDRK4 coefficients of the diagonal linear operator L for the step size h (Cox & Matthews 2002).
+    The phi-functions are evaluated by the contour integral of Kassam & Trefethen (2005) with M points, which avoids the cancellation error for small h*L.
+    The coefficients are calculated once per grid, operator and step size, and stored in `grid.etdrk4` (the most recently used ones only). The step size is rounded to 12 significant digits,
+    as the intervals of time_domain() differ in the last bits, so every interval with the same step size reuses the same coefficients.
+    operator is the key of L (see _operator_key), which the solver calculates once instead of once per interval.
+    They are always calculated in double precision, and stored in the dtype of the time integration of the grid.
+    '''
+    h = float('{:.12g}'.format(h))
+    key = (h, _operator_key(L) if operator is None else operator)
+    if key in grid.etdrk4:
+        grid.etdrk4.move_to_end(key)                         # the most recently used entry
+    else:
+        L = L.astype(complex)
+        E = np.exp(h*L)
+        E2 = np.exp(h*L/2)
+        r = np.exp(2j*np.pi*(np.arange(1,M+1) - 0.5)/M)     # points on the whole unit circle, as L may be complex
+        LR = h*L[...,None] + r                                # contour around each h*L
+        Q  = h*np.mean((np.exp(LR/2) - 1)/LR, axis=-1)
+        f1 = h*np.mean((-4 - LR + np.exp(LR)*(4 - 3*LR + LR**2))/LR**3, axis=-1)
+        f2 = h*np.mean((2 + LR + np.exp(LR)*(-2 + LR))/LR**3, axis=-1)
+        f3 = h*np.mean((-4 - 3*LR - LR**2 + np.exp(LR)*(4 - LR))/LR**3, axis=-1)
+        _lru_store(grid.etdrk4, key, tuple(c.astype(grid.state_cdtype) for c in (E, E2, Q, f1, f2, f3)), grid.cache_size)
+    return grid.etdrk4[key]
+
+# Exponential time differencing (ETDRK4) integration
+def solve_etdrk4(fun,t,u0,args,dt=None,store=None,checkpoint=None):
+    '''
+    This function solves adv_diff_eq or burger_eq with the fourth-order exponential time differencing Runge-Kutta method (ETDRK4).
+    The linear operator D*(iκ)**2 - v*(iκ) is diagonal in the Fourier domain and is integrated exactly, while the nonlinear term is integrated explicitly,
+    so the step size is not limited by the stiffness of the diffusion term.
+    fun is the RHS function, adv_diff_eq or burger_eq.
+    t is the temporal domain, which should take the form t = time_domain(tmax,dt).
+    u0 is the initial condition.
+    args is the tuple of the other inputs of fun, e.g. (grid,D) for burger_eq.
+    dt is the largest time step, the default is the spacing of t. 
+    For an ensemble, u0 is a 2D array (members x grid points), the parameters in args may have one value per member, and u.y has the shape (members, grid points, time).
+    If a snapshot_store is given, the solution at every time t is written to it as the integration progresses, instead of being kept in memory.
+    If a checkpoint_file is given, the state of the solver is saved to it periodically, and the integration can be continued with resume(path).
+
+    Returns:
+    u: the solution with the same attributes `t` and `y` as the output of solve_ivp, where each column of u.y is the solution at time t.
+    '''
+    try:
+        if fun not in _splits:
+            raise ValueError("`fun` must be adv_diff_eq, burger_eq or an equation from compose_eq().")
+        if isinstance(args[0], chebyshev_grid):
+            raise ValueError("The spectral time steppers need a periodic grid from create_grid.")
+        t = np.asarray(t, dtype=float)
+        if dt is None:
+            dt = t[1] - t[0] if len(t) > 1 else 1.0
+        if not(isinstance(dt, (float, int))) or dt <= 0:
+            raise ValueError("`dt` must be a numeric value greater than 0.")
+
+        grid = args[0]
+        stiff, nonstiff, nonlinear = _splits[fun](*args)
+        L = _state_operator(grid, stiff + nonstiff)           # the full diagonal linear operator
+        operator = _operator_key(L)
+        
+        y, write, state = _start('ETDRK4', fun, args, t, dt, u0, store, checkpoint)
+        if state is None:
+            vhat = grid.rfft(np.asarray(u0, grid.state_dtype))
+            nfev = 0
+            i0, j0 = 0, 0                                      # the output interval and the step in it to start from
+        else:
+            vhat, nfev, i0, j0 = state['vhat'], int(state['nfev']), int(state['i']), int(state['j'])
+        for i, (num_of_steps, h) in enumerate(_output_steps(t, dt)):
+            if i < i0:
+                continue
+            E, E2, Q, f1, f2, f3 = _etdrk4_coefficients(grid, L, h, operator=operator)
+            for j in range(j0 if i == i0 else 0, num_of_steps):
+                if nonlinear is None:
+                    vhat = E*vhat                              # linear equation: the exact propagator
+                else:
+                    Nv = nonlinear(grid, vhat)
+                    a = E2*vhat + Q*Nv
+                    Na = nonlinear(grid, a)
+                    b = E2*vhat + Q*Na
+                    Nb = nonlinear(grid, b)
+                    c = E2*a + Q*(2*Nb - Nv)
+                    Nc = nonlinear(grid, c)
+                    vhat = E*vhat + Nv*f1 + 2*(Na + Nb)*f2 + Nc*f3
+                    nfev += 4
+                if checkpoint is not None and checkpoint.due():
+                    checkpoint.save(y, i, j+1, vhat=vhat, nfev=nfev)
+            write(i+1, grid.irfft(vhat))
+
+        if store is not None:
+            store.flush()
+        return OptimizeResult(t=t, y=y, nfev=nfev, status=0, message='ETDRK4 integration finished.', success=True)
+
+    except ValueError as e:
+        print("Value Error:", str(e))
+        return None
+
+# Semi-implicit (IMEX) integration
+def solve_imex(fun,t,u0,args,dt=None,store=None,checkpoint=None):
+    '''
+    This function solves adv_diff_eq or burger_eq with the semi-implicit Crank-Nicolson/Adams-Bashforth (CN-AB2) method.
+    The stiff diffusion term D*u_xx is treated implicitly, which is a division in the Fourier domain, 
+    and the advection term -v*u_x and the nonlinear term -u*u_x are treated explicitly.
+    The stable step size is then limited by the advection (CFL condition) instead of the diffusion, which scales with 1/num_of_points**2.
+    fun is the RHS function, adv_diff_eq or burger_eq.
+    t is the temporal domain, which should take the form t = time_domain(tmax,dt).
+    u0 is the initial condition.
+    args is the tuple of the other inputs of fun, e.g. (grid,D) for burger_eq.
+    dt is the largest time step, the default is the spacing of t. 
+    For an ensemble, u0 is a 2D array (members x grid points), the parameters in args may have one value per member, and u.y has the shape (members, grid points, time).
+    If a snapshot_store is given, the solution at every time t is written to it as the integration progresses, instead of being kept in memory.
+    If a checkpoint_file is given, the state of the solver is saved to it periodically, and the integration can be continued with resume(path).
+
+    Returns:
+    u: the solution with the same attributes `t` and `y` as the output of solve_ivp, where each column of u.y is the solution at time t.
+    '''
+    try:
+        if fun not in _splits:
+            raise ValueError("`fun` must be adv_diff_eq, burger_eq or an equation from compose_eq().")
+        if isinstance(args[0], chebyshev_grid):
+            raise ValueError("The spectral time steppers need a periodic grid from create_grid.")
+        t = np.asarray(t, dtype=float)
+        if dt is None:
+            dt = t[1] - t[0] if len(t) > 1 else 1.0
+        if not(isinstance(dt, (float, int))) or dt <= 0:
+            raise ValueError("`dt` must be a numeric value greater than 0.")
+
+        grid = args[0]
+        stiff, nonstiff, nonlinear = _splits[fun](*args)
+        stiff, nonstiff = _state_operator(grid, stiff), _state_operator(grid, nonstiff)
+
+        def explicit(vhat):
+            '''
+            The explicit part of the RHS in the Fourier domain.
+            '''
+            if nonlinear is None:
+                return nonstiff*vhat
+            return nonstiff*vhat + nonlinear(grid, vhat)
+
+        y, write, state = _start('IMEX', fun, args, t, dt, u0, store, checkpoint)
+        if state is None:
+            vhat = grid.rfft(np.asarray(u0, grid.state_dtype))
+            Ev_old = None                                      # explicit part at the previous step, None before the first step
+            h_old = None
+            nfev = 0
+            i0, j0 = 0, 0                                      # the output interval and the step in it to start from
+        else:
+            vhat, nfev, i0, j0 = state['vhat'], int(state['nfev']), int(state['i']), int(state['j'])
+            Ev_old = state['Ev_old'] if 'Ev_old' in state else None
+            h_old = float(state['h_old']) if 'h_old' in state else None
+        for i, (num_of_steps, h) in enumerate(_output_steps(t, dt)):
+            if i < i0:
+                continue
+            implicit = 1/(1 - h/2*stiff)                       # Crank-Nicolson solve, diagonal in the Fourier domain
+            explicit_cn = 1 + h/2*stiff
+            for j in range(j0 if i == i0 else 0, num_of_steps):
+                Ev = explicit(vhat)
+                nfev += 1
+                if Ev_old is None:
+                    extrapolated = Ev                          # first step: forward Euler for the explicit part
+                else:
+                    w = h/(2*h_old)                            # variable step Adams-Bashforth 2 weights
+                    extrapolated = (1 + w)*Ev - w*Ev_old
+                vhat = implicit*(explicit_cn*vhat + h*extrapolated)
+                Ev_old, h_old = Ev, h
+                if checkpoint is not None and checkpoint.due():
+                    checkpoint.save(y, i, j+1, vhat=vhat, nfev=nfev, Ev_old=Ev_old, h_old=h_old)
+            write(i+1, grid.irfft(vhat))
+
+        if store is not None:
+            store.flush()
+        return OptimizeResult(t=t, y=y, nfev=nfev, status=0, message='IMEX CN-AB2 integration finished.', success=True)
+
+    except ValueError as e:
+        print("Value Error:", str(e))
+        return None
+
+# Ensemble integration
+def solve_ensemble(fun,t,u0,args,method='DOP853',**options):
+    '''
+    This function solves an ensemble of simulations that only differ in the initial condition and the parameters with one solve_ivp call.
+    All members are advanced together, and their derivatives are calculated by one FFT call along the grid axis.
+    fun is the RHS function, e.g. adv_diff_eq or burger_eq.
+    t is the temporal domain, which should take the form t = time_domain(tmax,dt).
+    u0 is a 2D array of initial conditions, one row per member.
+    args is the tuple of the other inputs of fun, e.g. (grid,D,v) for adv_diff_eq, where D and v may be arrays with one value per member.
+    method and the other options are passed to solve_ivp. Note that the step size of an adaptive method is shared by all members.
+    The same function also solves a single simulation on a 2D or 3D grid, where u0 has the shape of the grid.
+
+    Returns:
+    u: the output of solve_ivp, with u.y reshaped to the shape of u0 plus the time axis, e.g. (members, grid points, time).
+    '''
+    u0 = np.asarray(u0, dtype=float)
+    shape = u0.shape
+
+    def ensemble_fun(t, y, *args):
+        '''
+        The flat ODE system of all members, as solve_ivp only accepts 1D states.
+        '''
+        return fun(t, y.reshape(shape), *args).ravel()
+
+    u = solve_ivp(ensemble_fun, [t[0],t[-1]], u0.ravel(), method=method, t_eval=t, args=args, **options)
+    u.y = u.y.reshape(shape + (-1,))
+    return u
+
+# One entry point for every integration method
+methods = ('RK45', 'RK23', 'DOP853', 'Radau', 'BDF', 'LSODA', 'ETDRK4', 'IMEX', 'exact')
+
+def solve(fun,t,u0,args,method='DOP853',**options):
+    '''
+    This function solves the PDE with any of the integration methods of this module, selected by name, e.g. for parameter sweeps and benchmarks.
+    fun is the RHS function, e.g. adv_diff_eq, burger_eq or an equation from compose_eq.
+    t is the temporal domain, which should take the form t = time_domain(tmax,dt).
+    u0 is the initial condition (or a 2D array of initial conditions for an ensemble).
+    args is the tuple of the other inputs of fun, e.g. (grid,D) for burger_eq.
+    method is one of `methods`: a solve_ivp method (solve_ensemble is used for an ensemble or a 2D/3D grid), 'ETDRK4' (solve_etdrk4),
+    'IMEX' (solve_imex) or 'exact' (adv_diff_exact, for the advection diffusion equation only). The other options are passed to the solver.
+
+    Returns:
+    u: the output of the solver, with the attributes `t` and `y` as in the output of solve_ivp.
+    '''
+    try:
+        if method not in methods:
+            raise ValueError("`method` must be one of {}.".format(list(methods)))
+        if method == 'exact' and fun is not adv_diff_eq:
+            raise ValueError("The 'exact' method is only available for the advection diffusion equation.")
+    except ValueError as e:
+        print("Value Error:", str(e))
+        return None
+
+    if method == 'ETDRK4':
+        return solve_etdrk4(fun, t, u0, args, **options)
+    if method == 'IMEX':
+        return solve_imex(fun, t, u0, args, **options)
+    if method == 'exact':
+        return adv_diff_exact(t, args[0], u0, *args[1:], **options)
+    if np.ndim(u0) > 1:
+        return solve_ensemble(fun, t, u0, args, method=method, **options)
+    return solve_ivp(fun, [t[0],t[-1]], u0, method=method, t_eval=t, args=args, **options)
+
+# Integration of the Fourier coefficients (spectral state)
+def to_spectral(grid,u):
+    '''
+    This function returns the real-packed Fourier coefficients of u: a 1D float array with the real and imaginary parts of the
+    half spectrum of u interleaved, (Re uhat_0, Im uhat_0, Re uhat_1, Im uhat_1, ...). This is the state used by solve_spectral.
+    '''
+    return np.ascontiguousarray(grid.rfft(np.asarray(u, float)), dtype=complex).reshape(-1).view(float)
+
+def from_spectral(grid,y,shape=None):
+    '''
+    This function returns the function u in the physical domain from its real-packed Fourier coefficients y (see to_spectral).
+    shape is the shape of u, the default is the shape of the grid (one simulation). For an ensemble, shape is (members,) + grid shape.
+    '''
+    shape = grid.shape if shape is None else tuple(shape)
+    spectrum = shape[:len(shape)-grid.ndim] + grid.rshape
+    return grid.irfft(np.ascontiguousarray(y).view(complex).reshape(spectrum))
+
+def spectral_rhs(fun,args):
+    '''
+    This function returns the RHS of adv_diff_eq or burger_eq for the real-packed Fourier coefficients (see to_spectral),
+    as a function rhs(t,y) that can be passed to solve_ivp.
+    The linear terms are one precomputed multiplier, so only the nonlinear term of the burger's equation needs a transform to the physical domain and back.
+    The advection diffusion equation does not need any transform.
+    '''
+    if fun not in _splits:
+        raise ValueError("`fun` must be adv_diff_eq, burger_eq or an equation from compose_eq().")
+    if isinstance(args[0], chebyshev_grid):
+        raise ValueError("The spectral state needs a periodic grid from create_grid.")
+    grid = args[0]
+    stiff, nonstiff, nonlinear = _splits[fun](*args)
+    L = stiff + nonstiff                                   # the full diagonal linear operator
+
+    def rhs(t, y):
+        '''
+        The RHS in the Fourier domain, for the real-packed coefficients y.
+        '''
+        uhat = np.ascontiguousarray(y).view(complex).reshape((-1,) + grid.rshape)
+        duhat_dt = L*uhat
+        if nonlinear is not None:
+            duhat_dt += nonlinear(grid, uhat)
+        return duhat_dt.reshape(-1).view(float)
+
+    return rhs
+
+def solve_spectral(fun,t,u0,args,method='DOP853',**options):
+    '''
+    This function solves adv_diff_eq or burger_eq with solve_ivp, where the state of the integration is the real-packed Fourier coefficients of u
+    instead of u. The transforms to the physical domain are only done for the nonlinear term and for the output.
+    fun is the RHS function, adv_diff_eq or burger_eq.
+    t is the temporal domain, which should take the form t = time_domain(tmax,dt).
+    u0 is the initial condition (or a 2D array of initial conditions for an ensemble).
+    args is the tuple of the other inputs of fun, e.g. (grid,D) for burger_eq.
+    method and the other options are passed to solve_ivp.
+
+    Returns:
+    u: the output of solve_ivp, where u.y is the solution in the physical domain with the shape of u0 plus the time axis.
+    '''
+    try:
+        grid = args[0]
+        shape = np.shape(u0)
+        rhs = spectral_rhs(fun, args)
+        u = solve_ivp(rhs, [t[0],t[-1]], to_spectral(grid,u0), method=method, t_eval=t, **options)
+        y = from_spectral(grid, u.y.T, (u.y.shape[1],) + shape)           # one inverse transform per output time
+        u.y = np.moveaxis(y, 0, -1)
+        return u
+
+    except ValueError as e:
+        print("Value Error:", str(e))
+        return None
+
+# Analytic Jacobian for the implicit methods of solve_ivp
+def jacobian(fun,args,spectral=False,form='dense'):
+    '''
+    This function returns the analytic Jacobian of adv_diff_eq or burger_eq, built from the Fourier multipliers of the grid,
+    for the implicit methods of solve_ivp (method = 'BDF' or 'Radau'), which otherwise approximate the Jacobian by N finite differences of the RHS.
+    fun is the RHS function, adv_diff_eq or burger_eq.
+    args is the tuple of the other inputs of fun, e.g. (grid,D) for burger_eq, for one simulation (not an ensemble).
+    
+    spectral = True is for the real-packed Fourier coefficients of solve_spectral. The Jacobian of the advection diffusion equation
+    is then a constant sparse matrix with 2x2 blocks on the diagonal, so every Newton iteration of BDF/Radau costs O(N).
+    Pass it as jac to solve_spectral. This is only available for the (linear) advection diffusion equation.
+
+    spectral = False is for the physical domain state of solve_ivp, and returns a function jac(t,u) to pass as jac to solve_ivp.
+    form = 'dense' returns the Jacobian as a dense array. The linear part is built once (for the burger's equation, J(u) = J_linear - diag(u)*C - diag(u_x),
+    where C is the first derivative matrix), so no RHS evaluations are spent on the Jacobian.
+    form = 'operator' returns a scipy LinearOperator that applies the Jacobian with FFTs in O(N log N), for Newton-Krylov solvers
+    such as scipy.optimize.newton_krylov. Note that solve_ivp itself only accepts dense or sparse matrices.
+    The dealiasing mask of the grid is not included in the Jacobian.
+    '''
+    try:
+        if fun not in _splits:
+            raise ValueError("`fun` must be adv_diff_eq, burger_eq or an equation from compose_eq().")
+        if form not in ('dense', 'operator'):
+            raise ValueError("`form` must be 'dense' or 'operator'.")
+        if isinstance(args[0], chebyshev_grid):
+            raise ValueError("The analytic Jacobian needs a periodic grid from create_grid.")
+        grid = args[0]
+        stiff, nonstiff, nonlinear = _splits[fun](*args)
+        if nonlinear is not None and fun is not burger_eq:
+            raise ValueError("The Jacobian of an equation from compose_eq() is only available if all its terms are linear.")
+        L = np.broadcast_to(stiff + nonstiff, grid.rshape)     # the full diagonal linear operator
+
+        if spectral:
+            if nonlinear is not None:
+                raise ValueError("The spectral Jacobian is only available for the advection diffusion equation.")
+            # d(Re uhat)/dt = Re(L)*Re(uhat) - Im(L)*Im(uhat), d(Im uhat)/dt = Im(L)*Re(uhat) + Re(L)*Im(uhat)
+            Lr, Li = L.real.ravel(), L.imag.ravel()
+            main = np.repeat(Lr, 2)
+            upper = np.zeros(2*Lr.size - 1)
+            upper[0::2] = -Li
+            lower = np.zeros(2*Lr.size - 1)
+            lower[0::2] = Li
+            return scipy.sparse.diags([lower, main, upper], [-1, 0, 1], format='csc')
+
+        size = int(np.prod(grid.shape))
+        if form == 'operator':
+            def jac(t, u, *args):
+                '''
+                The Jacobian at the state u, as a LinearOperator.
+                '''
+                u = np.reshape(u, grid.shape)
+                if nonlinear is not None:
+                    d_u = grid.irfft(grid.grad_sum*grid.rfft(u))
+                def matvec(w):
+                    w = np.reshape(w, grid.shape)
+                    what = grid.rfft(w)
+                    Jw = grid.irfft(L*what)
+                    if nonlinear is not None:
+                        Jw -= u*grid.irfft(grid.grad_sum*what) + d_u*w       # linearisation of -u*u_x
+                    return Jw.ravel()
+                return LinearOperator((size, size), matvec=matvec, dtype=float)
+            return jac
+
+        identity = np.eye(size).reshape((size,) + grid.shape)
+        J_linear = grid.irfft(L*grid.rfft(identity)).reshape(size, size).T    # column j is the linear operator applied to the unit vector j
+        if nonlinear is None:
+            return lambda t, u, *args: J_linear
+        C = grid.irfft(grid.grad_sum*grid.rfft(identity)).reshape(size, size).T
+
+        def jac(t, u, *args):
+            '''
+            The Jacobian of the burger's equation at the state u, as a dense array.
+            '''
+            u = np.ravel(u)
+            J = J_linear - u[:,None]*C
+            J[np.diag_indices(size)] -= C @ u
+            return J
+        return jac
+
+    except ValueError as e:
+        print("Value Error:", str(e))
+        return None
+
+# Streaming output to the disk
+class snapshot_store:
+    '''
+    This is a class that stores the solution of a simulation on the disk, one snapshot per output time, so that the memory used by a long,
+    high-resolution run does not grow with the number of output times.
+    The store is a directory with the memory-mapped numpy file `u.npy` (one snapshot per row), the times `t.npy` and `meta.json`.
+    Snapshots are loaded lazily: `frame(i)` reads one snapshot, and `y` is a view with the same layout as the output of solve_ivp
+    (the time along the last axis) that only reads the snapshots that are used, e.g. by plot_anim.
+    If the directory already contains a store, it is opened for reading.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.frames = None
+        self.t = None
+        self.written = 0
+        if os.path.exists(os.path.join(path, 'u.npy')):
+            self.open()
+
+    def create(self, shape, t, dtype=float):
+        '''
+        This is the function to create the (empty) store for snapshots with the given shape at the times t.
+        '''
+        os.makedirs(self.path, exist_ok=True)
+        self.t = np.asarray(t, dtype=float)
+        np.save(os.path.join(self.path, 't.npy'), self.t)
+        self.frames = np.lib.format.open_memmap(os.path.join(self.path, 'u.npy'), mode='w+', dtype=dtype, shape=(len(self.t),) + tuple(shape))
+        self.written = 0
+        self.flush()
+
+    def open(self, mode='r'):
+        '''
+        This is the function to open an existing store ('r' for reading, 'r+' for writing more snapshots).
+        '''
+        self.frames = np.load(os.path.join(self.path, 'u.npy'), mmap_mode=mode)
+        self.t = np.load(os.path.join(self.path, 't.npy'))
+        with open(os.path.join(self.path, 'meta.json')) as f:
+            self.written = json.load(f)['written']
+
+    def write(self, i, u):
+        '''
+        This is the function to write the snapshot u at the time t[i].
+        '''
+        self.frames[i] = u
+        self.written = max(self.written, i + 1)
+
+    def flush(self):
+        '''
+        This is the function to make sure that every written snapshot is on the disk, and to record how many snapshots were written.
+        '''
+        if isinstance(self.frames, np.memmap) and self.frames.mode != 'r':
+            self.frames.flush()
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(dict(written=self.written, shape=list(self.frames.shape[1:]), dtype=self.frames.dtype.str), f)
+
+    def frame(self, i):
+        '''
+        This is the function to load the snapshot at the time t[i].
+        '''
+        return np.array(self.frames[i])
+
+    def __len__(self):
+        return self.written
+
+    @property
+    def y(self):
+        return np.moveaxis(self.frames, 0, -1)
+
+def solve_stream(fun,t,u0,args,store,method='DOP853',**options):
+    '''
+    This function solves the PDE with the integrators of solve_ivp, and writes the solution at every time t to a snapshot_store
+    as the integration progresses, instead of keeping the whole solution u.y in memory. The peak memory is then O(num_of_points).
+    The solution between the steps of the integrator is found from its dense output, as in solve_ivp with t_eval.
+    fun is the RHS function, e.g. adv_diff_eq or burger_eq.
+    t is the temporal domain, which should take the form t = time_domain(tmax,dt).
+    u0 is the initial condition (for an ensemble or a 2D/3D grid, an array of any shape).
+    args is the tuple of the other inputs of fun.
+    store is a snapshot_store.
+    method is a solve_ivp method ('RK45', 'DOP853', 'BDF', ...), and the other options are passed to the integrator.
+
+    Returns:
+    u: the solution with the attributes `t` and `y` (the lazy view of the store), `nfev`, `status`, `message` and `success`.
+    '''
+    t = np.asarray(t, dtype=float)
+    shape = np.shape(u0)
+
+    def flat_fun(t, y):
+        '''
+        The flat ODE system, as the integrators only accept 1D states.
+        '''
+        return fun(t, y.reshape(shape), *args).ravel()
+
+    solver = getattr(scipy.integrate, method)(flat_fun, t[0], np.ravel(u0).astype(float), t[-1], **options)
+    store.create(shape, t, args[0].dtype)
+    store.write(0, u0)
+    i = 1
+    while i < len(t) and solver.status == 'running':
+        solver.step()
+        if solver.status == 'failed':
+            break
+        if i < len(t) and t[i] <= solver.t:
+            dense = solver.dense_output()
+            while i < len(t) and t[i] <= solver.t:
+                store.write(i, dense(t[i]).reshape(shape))
+                i += 1
+    store.flush()
+
+    success = i == len(t)
+    message = 'The solver successfully reached the end of the integration interval.' if success else 'Integration step failed.'
+    return OptimizeResult(t=t, y=store.y, nfev=solver.nfev, status=0 if success else -1, message=message, success=success)
+
+# Checkpoint and restart
+class checkpoint_file:
+    '''
+    This is a class that periodically saves the state of solve_etdrk4 or solve_imex to the file `path` (a numpy .npz file),
+    so that a long simulation that is stopped can be continued with resume(path) instead of starting again from t=0.
+    The state is saved every `steps` time steps, or when `seconds` of wall time have passed since the last save (or both).
+    A checkpoint contains the Fourier coefficients of the solution and the other state of the method, the step that was reached,
+    the time domain, the step size, the equation and its parameters, the settings of the grid and the solution that was already written
+    (or the path of the snapshot store). The file is written under a temporary name first, so the checkpoint on the disk is always complete.
+    The resumed integration takes exactly the same steps, so its solution is the same, bit for bit, as the solution of an uninterrupted run.
+    '''
+    def __init__(self, path, steps=None, seconds=None):
+        try:
+            if steps is None and seconds is None:
+                raise ValueError("Either `steps` or `seconds` must be given.")
+            if steps is not None and (not(isinstance(steps, int)) or steps <= 0):
+                raise ValueError("`steps` must be an integer greater than 0.")
+            if seconds is not None and (not(isinstance(seconds, (float, int))) or seconds <= 0):
+                raise ValueError("`seconds` must be a numeric value greater than 0.")
+            self.path = path
+            self.steps = steps
+            self.seconds = seconds
+            self.state = None                                    # the loaded state, only set by load()
+            self.step = 0                                        # the number of time steps taken since t[0]
+            self.run = None
+            self.store = None
+            self.last = time.perf_counter()
+            return
+
+        except ValueError as e:
+            print("Value Error:", str(e))
+            return None
+
+    def start(self, method, fun, args, t, dt, u0, store):
+        '''
+        This is the function to record the inputs of the solver, which are saved with every checkpoint.
+        '''
+        params = np.empty(len(args) - 1, dtype=object)           # the parameters of the equation, e.g. D and v
+        for k, p in enumerate(args[1:]):
+            params[k] = p
+        self.run = dict(method=method, fun=fun.__name__, params=params, grid=json.dumps(args[0].settings),
+                        t=t, dt=dt, u0=u0, store='' if store is None else store.path)
+        self.store = store
+        self.last = time.perf_counter()
+        if self.state is not None:
+            self.step = int(self.state['step'])
+
+    def due(self):
+        '''
+        This is the function to count one time step, and to check if a checkpoint should be saved.
+        '''
+        self.step += 1
+        return ((self.steps is not None and self.step % self.steps == 0) or
+                (self.seconds is not None and time.perf_counter() - self.last >= self.seconds))
+
+    def save(self, y, i, j, **state):
+        '''
+        This is the function to save the state after the step j of the output interval i (between t[i] and t[i+1]).
+        Any state that is None (e.g. before the first step of a multistep method) is not saved.
+        '''
+        if self.store is None:
+            state['y'] = y[...,:i+1]                           # the solution at t[0], ..., t[i]
+        else:
+            self.store.flush()
+        state = {key: value for key, value in state.items() if value is not None}
+        tmp_path = self.path + '.tmp.npz'
+        np.savez(tmp_path, i=i, j=j, step=self.step, **self.run, **state)
+        os.replace(tmp_path, self.path)
+        self.last = time.perf_counter()
+
+    def load(self):
+        '''
+        This is the function to load the last checkpoint from the disk.
+        '''
+        with np.load(self.path, allow_pickle=True) as data:
+            self.state = {key: data[key] for key in data.files}
+        return self.state
+
+def resume(path, steps=None, seconds=None):
+    '''
+    This function continues the integration that saved the checkpoint file `path` from its last checkpoint.
+    The grid, the equation and its parameters, and the snapshot store (if any) are restored from the checkpoint.
+    steps and seconds are the cadence of the checkpoints of the continued integration. By default no new checkpoints are saved.
+
+    Returns:
+    u: the solution for the whole temporal domain, the same as the output of solve_etdrk4 or solve_imex.
+    '''
+    if steps is None and seconds is None:
+        seconds = np.inf
+    checkpoint = checkpoint_file(path, steps=steps, seconds=seconds)
+    state = checkpoint.load()
+    grid = create_grid(**json.loads(str(state['grid'])))
+    fun = {f.__name__: f for f in _splits}[str(state['fun'])]
+    args = (grid,) + tuple(state['params'])
+    store = snapshot_store(str(state['store'])) if str(state['store']) else None
+    solver = {'ETDRK4': solve_etdrk4, 'IMEX': solve_imex}[str(state['method'])]
+    return solver(fun, state['t'], state['u0'], args, dt=float(state['dt']), store=store, checkpoint=checkpoint)
+
 # Set up animated plot
-def plot_anim(t,grid,u0,u):
+def _frame_limits(y, frames):
+    '''
+    This function finds the range of the solution over the given frames, one frame at a time, so a snapshot store is never loaded at once.
+    '''
+    low, high = np.inf, -np.inf
+    for i in frames:
+        low, high = min(low, np.min(y[...,i])), max(high, np.max(y[...,i]))
+    if low == high:                                      # a constant solution, leave some space around the line
+        low, high = low - 1, high + 1
+    return low, high
+
+def plot_anim(t,grid,u0,u,every=1):
     '''
     This function is used to plot the stationary plot and animation of the wave.
     The first subplot shows the initial state and the final state of the function.
     The second subplot shows the movement of the wave with time. 
+    u is the solution (e.g. the output of solve_ivp) or a snapshot_store.
+    every is the frame decimation: only every `every`th time is shown in the animation, which makes long animations much smaller.
+    The time is shown by a text artist inside the axes, so only the line and the text are redrawn in each frame (blitting).
+    For long runs, save_anim writes the animation to an MP4 or GIF file instead of embedding every frame in the notebook.
     '''
     x = grid.x
+    frames = range(0, len(t), every)
     fig, (ax1, ax2) = plt.subplots(nrows=1, ncols=2, figsize=(12, 4))
     
     ax1.plot(x,u0,label='u at t = 0')
@@ -154,21 +1927,145 @@ def plot_anim(t,grid,u0,u):
 
     line, = ax2.plot([],[],lw=3)
     ax2.set_xlim((x[0],x[-1]))
-    ax2.set_ylim((np.min(u.y),np.max(u.y)))
-    ax2.set_title('t = {:.3f}'.format(t[0])) 
+    title = ax2.text(0.5, 0.92, '', transform=ax2.transAxes, ha='center', fontsize=12)
 
     def plot_frame(i):
         line.set_data(x,u.y[:,i])
-        ax2.set_title('t = {:.3f}'.format(t[i]))
-        fig.canvas.draw()
-        return line,
+        title.set_text('t = {:.3f}'.format(t[i]))
+        return line, title
 
     # Animate the solution
-    anim = animation.FuncAnimation(fig, plot_frame,frames=len(t),interval=80,repeat=False,blit=True)
+    anim = animation.FuncAnimation(fig, plot_frame,frames=frames,interval=80,repeat=False,blit=True)
     plt.close()
     
     try:
+        ax2.set_ylim(_frame_limits(u.y, frames))
         return HTML(anim.to_jshtml())
     except IndexError:
         print('Sorry, there is something wrong with the parameter value or initial condition selection.')
         return None
+
+def _render_frames(source, frames, t, x, ylim, dpi):
+    '''
+    This function draws the given frames of the animation of save_anim, and returns them as a list of RGB images.
+    source is the path of a snapshot store, which is read one frame at a time, or an array with the solution at the given frames.
+    It runs in a worker process, so it uses its own Agg canvas instead of pyplot.
+    '''
+    y = snapshot_store(source).y if isinstance(source, str) else source
+    fig = Figure(figsize=(6, 4), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    line, = ax.plot(x, np.zeros_like(x), lw=3)
+    ax.set_xlim((x[0],x[-1]))
+    ax.set_ylim(ylim)
+    ax.set_xlabel('x')
+    ax.set_ylabel('u')
+    title = ax.text(0.5, 0.92, '', transform=ax.transAxes, ha='center', fontsize=12)
+    images = []
+    for k, i in enumerate(frames):
+        line.set_ydata(y[...,i] if isinstance(source, str) else y[...,k])
+        title.set_text('t = {:.3f}'.format(t[i]))
+        canvas.draw()
+        images.append(np.asarray(canvas.buffer_rgba())[...,:3].copy())
+    return images
+
+class _gif_writer:
+    '''
+    This is a class that writes a GIF file one frame at a time. All frames use the colour palette of the first frame,
+    so each frame is written as soon as it is drawn and the frames are never kept in memory.
+    '''
+    def __init__(self, filename, fps):
+        self.file = open(filename, 'wb')
+        self.duration = int(round(1000/fps))
+        self.palette = None
+
+    def write(self, image):
+        image = Image.fromarray(image)
+        if self.palette is None:
+            self.palette = image.quantize(colors=256)
+            frame = image.quantize(palette=self.palette)
+            for data in GifImagePlugin.getheader(frame, info=dict(loop=0))[0]:
+                self.file.write(data)
+        else:
+            frame = image.quantize(palette=self.palette)
+        for data in GifImagePlugin.getdata(frame, duration=self.duration):
+            self.file.write(data)
+
+    def close(self):
+        self.file.write(b';')                            # the GIF trailer
+        self.file.close()
+
+class _ffmpeg_writer:
+    '''
+    This is a class that writes an MP4 file by sending each frame to an ffmpeg process through a pipe, as soon as it is drawn.
+    '''
+    def __init__(self, filename, fps):
+        self.filename = filename
+        self.fps = fps
+        self.process = None
+
+    def write(self, image):
+        if self.process is None:
+            height, width = image.shape[:2]
+            self.process = subprocess.Popen([plt.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+                                             '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', '{}x{}'.format(width, height), '-r', str(self.fps), '-i', '-',
+                                             '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-vcodec', 'libx264', '-pix_fmt', 'yuv420p', self.filename],
+                                            stdin=subprocess.PIPE)
+        self.process.stdin.write(image.tobytes())
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+
+def save_anim(filename,t,grid,u,every=1,fps=12,processes=None,dpi=100,chunk=16):
+    '''
+    This function writes the animation of the solution to an MP4 (ffmpeg must be installed) or GIF file, depending on the file extension.
+    Unlike plot_anim, the frames are not embedded in the notebook: they are drawn in parallel by `processes` worker processes
+    (the default is the number of CPUs, 1 draws them in this process), `chunk` frames per task, and are written to the file in order as they arrive.
+    u is the solution (e.g. the output of solve_ivp) or a snapshot_store. The workers read the frames of a snapshot store directly from the disk,
+    so the solution is never loaded into memory at once.
+    every is the frame decimation: only every `every`th time is drawn.
+    fps is the number of frames per second, and dpi the resolution of the frames.
+
+    Returns:
+    filename: the name of the written file.
+    '''
+    try:
+        extension = os.path.splitext(filename)[1].lower()
+        if extension not in ('.mp4', '.gif'):
+            raise ValueError("`filename` must end with '.mp4' or '.gif'.")
+        if extension == '.mp4' and shutil.which(plt.rcParams['animation.ffmpeg_path']) is None:
+            raise ValueError("Writing MP4 files requires ffmpeg to be installed.")
+        if not(isinstance(every, int)) or every <= 0:
+            raise ValueError("`every` must be an integer greater than 0.")
+        if np.ndim(grid.x) != 1 or np.shape(u.y)[:-1] != np.shape(grid.x):
+            raise ValueError("The animation is only available for a single solution on a 1D grid.")
+    except ValueError as e:
+        print("Value Error:", str(e))
+        return None
+
+    t = np.asarray(t)
+    frames = list(range(0, len(t), every))
+    ylim = _frame_limits(u.y, frames)
+    chunks = [frames[k:k+chunk] for k in range(0, len(frames), chunk)]
+    if isinstance(u, snapshot_store):
+        sources = [u.path]*len(chunks)
+    else:
+        sources = [np.asarray(u.y[...,c]) for c in chunks]
+
+    writer = _gif_writer(filename, fps) if extension == '.gif' else _ffmpeg_writer(filename, fps)
+    try:
+        if processes == 1:
+            for source, c in zip(sources, chunks):
+                for image in _render_frames(source, c, t, grid.x, ylim, dpi):
+                    writer.write(image)
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                # map returns the chunks in order, so each one is written as soon as it and the chunks before it are drawn
+                for images in pool.map(_render_frames, sources, chunks, repeat(t), repeat(grid.x), repeat(ylim), repeat(dpi)):
+                    for image in images:
+                        writer.write(image)
+    finally:
+        writer.close()
+    return filename
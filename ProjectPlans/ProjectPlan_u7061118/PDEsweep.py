@@ -0,0 +1,188 @@
+'''
+This module runs parameter sweeps of `PDEsolver` in parallel. Every setting of (D, v, length, num_of_points, ic) is solved by a separate process,
+and each solution is written to an on-disk store as soon as it is finished. A store holds one sweep: running the same sweep again only solves
+the settings that are not finished yet. Functions in this module include:
+
+settings_grid(D,v,length,num_of_points,ic)
+sweep(settings,t,equation,store,method,processes)
+load_result(store,index)
+load_sweep(store)
+'''
+
+import os
+import json
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.optimize import OptimizeResult
+import PDEsolver as pde
+
+# Named initial conditions, functions of the physical domain x
+def gaussian(x):
+    '''
+    Gaussian initial condition with width 0.8, as used in Project_test.ipynb.
+    '''
+    return np.exp(-x**2/(2*0.8**2))
+
+def sech2(x):
+    '''
+    Squared hyperbolic secant initial condition.
+    '''
+    return 1/np.cosh(x)**2
+
+def sine(x):
+    '''
+    One period of a negative sine wave over the domain.
+    '''
+    length = len(x)*(x[1] - x[0])
+    return -np.sin(2*np.pi*x/length)
+
+initial_conditions = {'gaussian': gaussian, 'sech2': sech2, 'sine': sine}
+
+def settings_grid(D=(1.0,), v=(1.0,), length=(10*np.pi,), num_of_points=(512,), ic=('gaussian',)):
+    '''
+    This function creates the list of all combinations of the given parameter values.
+    Each setting is a dictionary with the keys 'D', 'v', 'length', 'num_of_points' and 'ic'.
+    The order of the list is deterministic: the last parameter (ic) changes fastest.
+    '''
+    return [dict(D=D_i, v=v_i, length=length_i, num_of_points=n_i, ic=ic_i)
+            for D_i, v_i, length_i, n_i, ic_i in itertools.product(D, v, length, num_of_points, ic)]
+
+def _describe(setting):
+    '''
+    This function returns a copy of the setting that can be written to JSON, with a function initial condition replaced by its name.
+    '''
+    return {key: (value if isinstance(value, (str, int, float)) else getattr(value, '__name__', repr(value)))
+            for key, value in setting.items()}
+
+def _result_path(store, index):
+    '''
+    The file in the store for the setting with the given index.
+    '''
+    return os.path.join(store, '{:05d}.npz'.format(index))
+
+def _solve(setting, t, equation, method, options):
+    '''
+    This function solves a single setting, and returns the physical domain x and the solution u.
+    '''
+    grid = pde.create_grid(setting['length'], setting['num_of_points'])
+    ic = setting['ic']
+    u0 = initial_conditions[ic](grid.x) if isinstance(ic, str) else ic(grid.x)
+
+    if equation == 'adv_diff':
+        fun, args = pde.adv_diff_eq, (grid, setting['D'], setting['v'])
+    else:
+        fun, args = pde.burger_eq, (grid, setting['D'])
+
+    return grid.x, pde.solve(fun, t, u0, args, method, **options)
+
+def _run_setting(index, setting, t, equation, method, store, options):
+    '''
+    This function solves the setting with the given index in a worker process and writes the solution to the store.
+    The file is written under a temporary name first, so a finished file in the store is always complete.
+    If the solver returns None (e.g. for an invalid dt), a record with success = False and an empty solution is written instead.
+    '''
+    x, u = _solve(setting, t, equation, method, options)
+    if u is None:
+        u = OptimizeResult(t=t, y=np.empty((0,)), success=False, nfev=0)
+    path = _result_path(store, index)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, x=x, t=u.t, y=u.y, success=u.success, nfev=u.nfev, setting=json.dumps(_describe(setting)))
+    os.replace(tmp_path, path)
+    return index, bool(u.success), int(u.nfev)
+
+def sweep(settings, t, equation, store, method='DOP853', processes=None, verbose=True, **options):
+    '''
+    This function solves every setting with a pool of worker processes, and writes each solution to the directory `store` as it finishes.
+    settings is a list of dictionaries, e.g. from settings_grid(). The initial condition 'ic' is the name of one of `initial_conditions`,
+    or a function of x that is defined at the top level of a module (so it can be sent to the worker processes).
+    t is the temporal domain, which should take the form t = time_domain(tmax,dt).
+    equation is 'adv_diff' or 'burger'.
+    method is a solve_ivp method, 'ETDRK4', 'IMEX', or 'exact' (advection diffusion only). Other options are passed to the solver.
+    processes is the number of worker processes, the default is the number of CPUs.
+    The progress is reported in the order of the settings, so the output is the same for every run.
+    A setting whose solver raises an error is reported as failed (with the message in 'error'), and the other settings are still solved.
+    The description of the sweep is written to `sweep.json` in the store. If the store already holds the same sweep (e.g. an interrupted run),
+    the finished settings are not solved again. A store that holds a different sweep is not overwritten: use a new directory instead.
+
+    Returns:
+    summary: a list with one dictionary per setting (index, setting, success and the number of RHS evaluations), in the order of the settings.
+    '''
+    try:
+        if equation not in ('adv_diff', 'burger'):
+            raise ValueError("`equation` must be 'adv_diff' or 'burger'.")
+        if method not in pde.methods:
+            raise ValueError("`method` must be one of {}.".format(list(pde.methods)))
+        if method == 'exact' and equation != 'adv_diff':
+            raise ValueError("The 'exact' method is only available for the advection diffusion equation.")
+        for setting in settings:
+            if isinstance(setting['ic'], str) and setting['ic'] not in initial_conditions:
+                raise ValueError("`ic` must be one of {} or a function of x.".format(list(initial_conditions)))
+    except ValueError as e:
+        print("Value Error:", str(e))
+        return None
+
+    t = np.asarray(t, dtype=float)
+    description = dict(equation=equation, method=method, t=t.tolist(), options=json.loads(json.dumps(options, default=repr)),
+                       settings=[_describe(setting) for setting in settings])
+    try:
+        os.makedirs(store, exist_ok=True)
+        path = os.path.join(store, 'sweep.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                if json.load(f) != description:
+                    raise ValueError("The store `{}` already holds a different sweep, use a new directory.".format(store))
+        elif any(name.endswith('.npz') for name in os.listdir(store)):
+            raise ValueError("The store `{}` already holds results that are not from this sweep, use a new directory.".format(store))
+    except ValueError as e:
+        print("Value Error:", str(e))
+        return None
+    with open(path, 'w') as f:
+        json.dump(description, f)
+
+    summary = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [None if os.path.exists(_result_path(store, index)) else
+                   pool.submit(_run_setting, index, setting, t, equation, method, store, options)
+                   for index, setting in enumerate(settings)]
+        # Collect in submission order, so the progress report is deterministic
+        for index, (future, setting) in enumerate(zip(futures, settings)):
+            if future is None:                                 # finished by an earlier run of the same sweep
+                with np.load(_result_path(store, index)) as data:
+                    success, nfev = bool(data['success']), int(data['nfev'])
+            else:
+                try:
+                    index, success, nfev = future.result()
+                except Exception as e:                         # an error of the solver in the worker fails this setting only
+                    summary.append(dict(index=index, setting=_describe(setting), success=False, nfev=0,
+                                        error='{}: {}'.format(type(e).__name__, e)))
+                    if verbose:
+                        print('[{}/{}] failed with {}'.format(index + 1, len(settings), summary[-1]['error']))
+                    continue
+            summary.append(dict(index=index, setting=_describe(setting), success=success, nfev=nfev))
+            if verbose:
+                print('[{}/{}] D = {}, v = {}, length = {}, num_of_points = {}, ic = {}: {}'.format(
+                    index + 1, len(settings), setting['D'], setting['v'], setting['length'], setting['num_of_points'],
+                    summary[-1]['setting']['ic'], 'done' if success else 'failed'))
+
+    with open(os.path.join(store, 'summary.json'), 'w') as f:
+        json.dump(dict(equation=equation, method=method, results=summary), f, indent=1)
+    return summary
+
+def load_result(store, index):
+    '''
+    This function loads the solution of one setting from the store.
+
+    Returns:
+    u: the solution with the attributes `x`, `t`, `y` (as in the output of solve_ivp) and `setting`.
+    '''
+    with np.load(_result_path(store, index)) as data:
+        return OptimizeResult(x=data['x'], t=data['t'], y=data['y'], success=bool(data['success']),
+                              nfev=int(data['nfev']), setting=json.loads(str(data['setting'])))
+
+def load_sweep(store):
+    '''
+    This function loads the solutions of every finished setting in the store, in the order of the settings.
+    '''
+    indices = sorted(int(name[:-4]) for name in os.listdir(store) if name.endswith('.npz') and name[:-4].isdigit())
+    return [load_result(store, index) for index in indices]